@@ -1,18 +1,27 @@
-from flask import Flask, request, render_template, send_file, current_app
+from flask import Flask, Response, request, render_template, stream_template, current_app, jsonify, g
 import os
 import pandas as pd
 from werkzeug.utils import secure_filename
-import io
 import datetime
-import subprocess
 import hashlib
 from werkzeug.datastructures import MultiDict
 from collections import defaultdict
 import logging
+import unicodedata
+from urllib.parse import quote
 
-import module.load as load
+import module.schema as schema
+import module.aliases as aliases
 import module.validation as data_validation
+import module.incremental as incremental
+import module.stream_import as stream_import
+import module.form_data as form_data
 import module.email as email
+import module.transfer as transfer
+import module.mongo as mongo
+import module.export as export
+import module.journal as journal
+import module.reference as reference
 
 app = Flask(__name__)
 
@@ -24,7 +33,8 @@ app.secret_key = os.urandom(10)
 # Future developers should revisit this decision if the application's requirements change.
 UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'csv', 'xlsx'}
-FIELDS_PER_ENTRY = 88 # the number of data columns. 
+PAGINATE_ROWS = 500 # larger tables stay on the server and the page renders only the visible rows
+PAGE_SIZE = 100 # rows per window served by /rows
 
 # --please comment out this part if you run the app on your labtop--
 if os.getenv('META_REMOTE_PATH') is None or os.getenv('META_KEY_PATH') is None:
@@ -35,10 +45,22 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-OPTIONS = load.load_options(os.path.join(SCRIPT_DIR, '.metagenomongo.csv'))
-FIELDS = list(OPTIONS.keys())
-FIELDS_WITH_NO = FIELDS[:]
-FIELDS_WITH_NO.insert(0,'No')
+# .metagenomongo.csv, parsed again when it changes; every request uses the
+# version in g.schema from start to end
+SCHEMA = schema.SchemaCache(os.path.join(SCRIPT_DIR, '.metagenomongo.csv'))
+# Header mappings accepted in earlier imports (source header -> field)
+ALIASES = aliases.AliasStore(aliases.alias_file(os.path.join(SCRIPT_DIR, '.metagenomongo.csv')))
+# Files saved with /save, waiting to be copied to the server (run in the app root directory)
+TRANSFERS = transfer.TransferQueue(os.path.join(os.getcwd(), UPLOAD_FOLDER, 'spool'), transfer.scp, email.send_email)
+# Keys of the samples already in the master dataset, if one is configured
+REFERENCE = reference.from_environment(mongo)
+
+@app.before_request
+def load_schema():
+    g.schema = SCHEMA.get()
+
+def fields_with_no():
+    return ['No', *g.schema.fields]
 
 def allowed_file(filename):
     return '.' in filename and \
@@ -46,7 +68,7 @@ def allowed_file(filename):
 
 def add_no_col(data):
     data['No'] = range(1, len(data.index) + 1)
-    data = data.reindex(columns=FIELDS_WITH_NO, fill_value='')
+    data = data.reindex(columns=fields_with_no(), fill_value='')
     return data
 
 def check_user(user_name):
@@ -88,47 +110,44 @@ def check_user(user_name):
     user_hash.update(user_name.encode())
     return user_hash.hexdigest() in user_hashes
 
-def parse_form_data(form_data):
-    data_list = []
-    tmp = []
-    for key, value in form_data.items():
-        if "_0" in key: # Skip No column
-            tmp.extend(["", ""])# Add empty strings for 'delete' and 'duplicate'
-            continue
-        tmp.append(value)
-        if str(FIELDS_PER_ENTRY) in key:
-            data_list.append(tmp)
-            tmp = []
-    return data_list
-
-def save_file_server(output_value,file_name,errors):
+def save_file_server(chunks,file_name,errors):
+    # Returns the chunks of the file, written to the spool as they are sent
+    # to the client; the transfer runs in the background once the file is
+    # complete, see /transfers for its progress
     remote_path = os.getenv('META_REMOTE_PATH')
     key_path = os.getenv('META_KEY_PATH')
     if remote_path is None or key_path is None:
         errors['warning'].append("Set META_KEY_PATH and/or META_REMOTE_PATH.")
-        return
-    # absolute path of the current directory
-    path = os.getcwd()
-    filepath = os.path.join(path, app.config['UPLOAD_FOLDER'], file_name)
+        return chunks
     try:
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(output_value)
-        logging.info(f"File {file_name} saved successfully.")
+        return TRANSFERS.tee(file_name, chunks, key_path, remote_path)
     except FileNotFoundError:
         logging.error("File path does not exist.")
     except PermissionError:
         logging.error("Permission denied.")
-    
+    return chunks
+
+def attachment(file_name):
+    # Content-Disposition of a download, as send_file sets it
     try:
-        scp_command = ['scp', '-i', key_path, filepath, remote_path]
-        subprocess.run(scp_command, check=True)
-        email.send_email(file_name, remote_path) 
-        logging.info(f"File successfully transferred to {remote_path}")
-    except subprocess.CalledProcessError as e:
-        logging.error(f"An error occurred: {e}")
-        logging.info("Run in the app root directory on the gpu2")
-    finally:
-        os.remove(filepath)
+        file_name.encode('ascii')
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', file_name).encode('ascii', 'ignore').decode('ascii')
+        return {'filename': simple, 'filename*': "UTF-8''" + quote(file_name, safe="!#$&+-.^_`|~")}
+    return {'filename': file_name}
+
+def write_database(data, errors):
+    # Upsert the rows into the database; the rows it rejected are reported
+    # like validation errors
+    try:
+        results = mongo.upsert_table(mongo.get_collection(), data)
+    except Exception as e:
+        logging.error(f"Database write failed: {e}")
+        errors['fatal_error'].append([0, "", f"The database could not be updated: {e}"])
+        return
+    errors['fatal_error'].extend([row, "", message] for row, status, message in results if status == mongo.FAILED)
+    inserted = sum(status == mongo.INSERTED for _, status, _ in results)
+    logging.info(f"{inserted} rows inserted and {len(results) - inserted} rows written to the database.")
 
 def empty_check(last_data):
     for n in last_data:     
@@ -136,25 +155,44 @@ def empty_check(last_data):
             return True
     return False
 
-def custom_date_parser(x):
-    if len(x) == 4:
-        return pd.to_datetime(x, format='%Y').date()
-    elif len(x) == 7:
-        return pd.to_datetime(x, format='%Y-%m').date()
-    else:
-        return pd.to_datetime(x).date()
-
-def handle_empty_data(data_list, data, errors, user_name):
-    for l in data_list:
-        for df in l:
-            if df != "":
-                return None
+def handle_empty_data(data, errors, user_name, snapshot_id=None):
+    if (data.to_numpy() != "").any():
+        return None
     errors["warning"].append("No Data")
     data = add_no_col(data)
-    return render_template('index_with_table.html',
-            tables=[data.to_html(classes='data', header="true")],
-            errors=errors,
-            df=data, user_name=user_name)
+    return render_table(data, errors, user_name, snapshot_id)
+
+def render_table(data, errors, user_name, snapshot_id=None):
+    # The rows are materialized once as tuples and the page is streamed to
+    # the client as it is rendered.
+    # Large tables are kept on the server; the page fetches the rows it shows
+    # from /rows and sends edits back to it
+    if len(data.index) > PAGINATE_ROWS:
+        table_id = incremental.store_table(request.form.get("table_id"), data[g.schema.fields].reset_index(drop=True))
+        return stream_template('index_with_table.html', \
+                errors=errors, columns=list(data.columns), rows=[], user_name=user_name, snapshot_id=snapshot_id, \
+                table_id=table_id, paginated=True, total=len(data.index), page_size=PAGE_SIZE)
+    return stream_template('index_with_table.html', \
+                errors=errors, columns=list(data.columns), \
+                rows=list(data.itertuples(index=False, name=None)), user_name=user_name, snapshot_id=snapshot_id)
+
+def read_table(errors):
+    # The submitted table: kept on the server for paginated tables, posted as
+    # JSON columns by the page, or decoded from the row_col inputs
+    if request.form.get("paginated"):
+        paged = incremental.find_table(request.form.get("table_id"))
+        if paged is None:
+            errors['warning'].append("The table has expired. Please import the file again.")
+            return pd.DataFrame(columns=g.schema.fields)
+        with paged.lock:
+            return paged.table.reindex(columns=g.schema.fields, fill_value='')
+    if request.form.get("table"):
+        try:
+            return form_data.decode_columns(request.form["table"], g.schema.fields)
+        except ValueError as e:
+            errors['warning'].append(str(e))
+            return pd.DataFrame(columns=g.schema.fields)
+    return form_data.decode_cells(request.form, g.schema.fields)
 
 #remove user_name and action
 #add Delete and Duplicate
@@ -164,101 +202,206 @@ def organize_form_data(values):
     values["Delete"] = ""
     values["Duplicate"] = ""
 
-def clean_imported_file(data):
-    # Strip whitespace from headers
-    data.columns = data.columns.str.strip()
-    # Strip whitespace from data
-    data = data.applymap(lambda x: x.strip() if isinstance(x, str) else x)
-    # Replace NaN with empty strings
-    data = data.fillna('')
-    # Remove fully empty rows
-    data = data[~(data == '').all(axis=1)]
-    return data
-
-def check_fields_of_imported_file(data, filepath, errors, values):
-    # Get actual headers from the temporary DataFrame
-    imported_fields = list(data.columns)
-    # Identify headers in the input file that do not appear in the expected headers
-    incorrect_fields = [header for header in imported_fields if header not in FIELDS]
+def check_fields_of_imported_file(imported_fields, filepath, errors, values, header_mapping, user_name):
+    # Identify headers in the input file that do not appear in the expected
+    # headers and have no known alias. The file is kept in the upload folder
+    # and the page asks for the field of each of them (/mapHeaders).
+    incorrect_fields = [header for header in imported_fields
+                        if header not in g.schema.fields and header not in header_mapping]
     if incorrect_fields:
-        os.remove(filepath)
-        errors["fatal_error"].append("Input file contains unexpected fields :::" + ",".join(incorrect_fields))
+        suggestions = g.schema.resolver.resolve(incorrect_fields)
+        errors["fatal_error"].append("Input file contains unexpected fields :::" + ",".join(
+            f"{header} (did you mean {suggestions[header]}?)" if suggestions[header] else header
+            for header in incorrect_fields))
         return render_template('index.html', \
-            fields=FIELDS, values=values, errors=errors)
-
-def read_imported_file(file, filepath, errors):
-    file_name, ext = os.path.splitext(file.filename)
-    if ext == '.csv':
-        data = pd.read_csv(filepath, dtype=str, parse_dates=['collection_date', 'run_date'], date_format=custom_date_parser)  # Load as strings
-    elif ext == '.xlsx':
-        data = pd.read_excel(filepath, dtype=str, parse_dates=['collection_date', 'run_date'], date_format=custom_date_parser)
-    else:
-        os.remove(filepath)
-        errors['fatal_error'].append('Invalid file type')
-        return render_template('index_with_table.html', \
-            tables=[data.to_html(classes='data', header="true")], errors=errors, df=data)
-    return data
+            fields=g.schema.fields, values=values, errors=errors, user_name=user_name, \
+            upload=os.path.basename(filepath), mapping=[(header, suggestions[header]) for header in incorrect_fields])
+
+def import_file(filepath, imported_fields, errors, values, header_mapping, user_name):
+    rejected = check_fields_of_imported_file(imported_fields, filepath, errors, values, header_mapping, user_name)
+    if rejected:
+        return rejected
+    data = read_imported_file(filepath, errors, header_mapping)
+    data = add_no_col(data)
+    os.remove(filepath)
+    return render_table(data, errors, user_name)
+
+def read_imported_file(filepath, errors, header_mapping=None):
+    # Read, clean and validate the file chunk by chunk; only the cleaned
+    # table is kept in memory, not the intermediate copies of each step
+    chunks = list(stream_import.validate_chunks(stream_import.read_chunks(filepath), g.schema.fields, g.schema.column_rules,
+                                                errors, REFERENCE, header_mapping))
+    if not chunks:
+        return pd.DataFrame(columns=g.schema.fields)
+    return pd.concat(chunks, ignore_index=True)
+
+# Validate data and return the id of the snapshot that re-validates only the
+# changed rows on the next submission of the same table. Tables small enough
+# for one page are validated whole and get no snapshot.
+def validate_data(errors, data, snapshot_id=None):
+    if len(data.index) <= PAGINATE_ROWS:
+        data_validation.validation_all(g.schema.fields, g.schema.options, errors, data, g.schema.column_rules, REFERENCE)
+        return None
+    snapshot_id, snapshot = incremental.get_snapshot(snapshot_id, g.schema.fields, g.schema.options, g.schema.column_rules)
+    snapshot.validate(errors, data, REFERENCE)
+    return snapshot_id
 
 @app.route('/change', methods=['POST'])
 def change():
-    data_list = parse_form_data(request.form)
     errors = defaultdict(list)
     email.email_env_check(errors)
-    data = pd.DataFrame(data_list, columns=FIELDS)
-    data_validation.validation_all( FIELDS, OPTIONS, errors, data)
+    data = read_table(errors)
+    snapshot_id = validate_data(errors, data, request.form.get("snapshot_id"))
     data = add_no_col(data)
-    return render_template('index_with_table.html', \
-                tables=[data.to_html(classes='data', header="true")], \
-                errors=errors, \
-                df=data, user_name=request.form["user_name"])
+    return render_table(data, errors, request.form["user_name"], snapshot_id)
 
 @app.route('/addLine', methods=['POST'])
 def addLine():
-    data_list = parse_form_data(request.form)
     errors = defaultdict(list)
     email.email_env_check(errors)
-    data = pd.DataFrame(data_list, columns=FIELDS)
-    empty_response = handle_empty_data(data_list, data, errors, request.form["user_name"])
+    data = read_table(errors)
+    empty_response = handle_empty_data(data, errors, request.form["user_name"], request.form.get("snapshot_id"))
     if empty_response:
         return empty_response
-    data_validation.validation_all( FIELDS, OPTIONS, errors, data)
+    snapshot_id = validate_data(errors, data, request.form.get("snapshot_id"))
     new_data = data.iloc[-1]
     if empty_check(new_data):
         data.loc[len(data)] = new_data
         data.at[len(data)-1,'sampleID'] = ''
     data = add_no_col(data)
-    return render_template('index_with_table.html', \
-                tables=[data.to_html(classes='data', header="true")], \
-                errors=errors, \
-                df=data, user_name=request.form["user_name"])
+    return render_table(data, errors, request.form["user_name"], snapshot_id)
 
 @app.route('/save', methods=['GET', 'POST'])
 def save():
-    data_list = parse_form_data(request.form)
     user_name = request.form["user_name"]
     errors = defaultdict(list)
     email.email_env_check(errors)
-    data = pd.DataFrame(data_list, columns=FIELDS)
-    data_validation.validation_all( FIELDS, OPTIONS, errors, data)
+    data = read_table(errors)
+    snapshot_id = validate_data(errors, data, request.form.get("snapshot_id"))
     data = data.drop(columns=['Delete', 'Duplicate'])
     data = data.loc[:, ~data.columns.str.contains('^Unnamed')]
     if errors['fatal_error']:
         data['Delete'] = ''
         data['Duplicate'] = ''
         data = add_no_col(data)
-        return render_template('index_with_table.html', \
-            tables=[data.to_html(classes='data', header="true")], errors=errors, \
-            df=data, user_name=request.form["user_name"])
-    output = io.StringIO()
-    data.to_csv(output, index=False)
-    mem = io.BytesIO()
-    mem.write(output.getvalue().encode('utf-8'))
-    mem.seek(0)
+        return render_table(data, errors, user_name, snapshot_id)
+    # ?format=parquet saves a typed parquet file instead of the csv
+    file_format = request.args.get('format', 'csv')
+    if file_format not in export.FORMATS:
+        file_format = 'csv'
+    try:
+        chunks = export.chunks(data, g.schema.options, file_format)
+    except RuntimeError as e:
+        errors['warning'].append(str(e))
+        chunks = None
+    if chunks is not None and mongo.enabled():
+        write_database(data, errors)
+    if chunks is None or errors['fatal_error']:
+        data['Delete'] = ''
+        data['Duplicate'] = ''
+        data = add_no_col(data)
+        return render_table(data, errors, user_name, snapshot_id)
+    extension, mimetype = export.FORMATS[file_format]
     current_time = datetime.datetime.now()
-    file_name = user_name + current_time.strftime('_%Y-%m-%d-%H-%M-%S') +".csv"
-    save_file_server(output.getvalue(),file_name,errors)
-    return send_file(mem, mimetype='text/csv', \
-                     as_attachment=True, download_name=file_name)
+    file_name = user_name + current_time.strftime('_%Y-%m-%d-%H-%M-%S') + extension
+    # The file is encoded while it is sent (chunked) and written once, to the spool
+    response = Response(save_file_server(chunks,file_name,errors), mimetype=mimetype)
+    response.headers.set('Content-Disposition', 'attachment', **attachment(file_name))
+    return response
+
+@app.route('/transfers', methods=['GET'])
+def transfers():
+    return jsonify(transfers=TRANSFERS.status())
+
+@app.route('/rows', methods=['GET'])
+def rows():
+    # A window of the rows of a paginated table, with the No column
+    paged = incremental.find_table(request.args.get("table_id"))
+    if paged is None:
+        return jsonify(error="The table has expired. Please import the file again."), 404
+    start = max(request.args.get("start", 0, type=int), 0)
+    count = min(max(request.args.get("count", PAGE_SIZE, type=int), 0), PAGE_SIZE)
+    with paged.lock:
+        window = paged.table.iloc[start:start + count]
+        total = len(paged.table.index)
+    return jsonify(total=total, start=start, rows=[[row_index + 1, *row] for row_index, row
+                   in enumerate(window.itertuples(index=False, name=None), start)])
+
+def is_position(value):
+    return type(value) is int
+
+def is_rows_payload(payload):
+    # The rows and columns of a /rows request are ints, the edits [row, column, value]
+    return isinstance(payload, dict) \
+        and isinstance(payload.get("edits", []), list) \
+        and all(isinstance(edit, list) and len(edit) == 3 and is_position(edit[0]) and is_position(edit[1])
+                for edit in payload.get("edits", [])) \
+        and all(isinstance(payload.get(key, []), list) and all(is_position(row) for row in payload.get(key, []))
+                for key in ("duplicate", "delete"))
+
+@app.route('/rows', methods=['POST'])
+def update_rows():
+    # Apply the edits made on a paginated table: "edits" is a list of
+    # [row, column, value] with columns numbered as in the page (0 is No),
+    # "delete" and "duplicate" are lists of rows. Each request is one step of
+    # the journal of the table; "undo" or "redo" reverts or applies the last
+    # one again.
+    payload = request.get_json(silent=True) or {}
+    if not is_rows_payload(payload):
+        return jsonify(error="Invalid edits."), 400
+    paged = incremental.find_table(payload.get("table_id"))
+    if paged is None:
+        return jsonify(error="The table has expired. Please import the file again."), 404
+    with paged.lock:
+        table = journal.FrameTable(paged.table)
+        if payload.get("undo"):
+            paged.journal.undo(table)
+        elif payload.get("redo"):
+            paged.journal.redo(table)
+        else:
+            frame = table.frame
+            edits = [(row, col - 1, str(value)) for row, col, value in payload.get("edits", [])
+                     if 0 <= row < len(frame.index) and 1 <= col <= len(frame.columns)]
+            changes = [journal.cell_changes([row for row, _, _ in edits], [col for _, col, _ in edits],
+                                            [frame.iat[row, col] for row, col, _ in edits], [value for _, _, value in edits])]
+            # Duplicates are added at the end, then the deleted rows are
+            # removed last first so the other indexes stay valid
+            changes += [journal.RowInsert(len(frame.index) + n, frame.iloc[row].tolist())
+                        for n, row in enumerate(row for row in payload.get("duplicate", []) if 0 <= row < len(frame.index))]
+            changes += [journal.RowDelete(row, frame.iloc[row].tolist())
+                        for row in sorted({row for row in payload.get("delete", []) if 0 <= row < len(frame.index)}, reverse=True)]
+            paged.journal.perform('Edit', changes, table)
+        paged.table = table.frame
+        total = len(table.frame.index)
+        can_undo, can_redo = bool(paged.journal.done), bool(paged.journal.undone)
+    return jsonify(total=total, undo=can_undo, redo=can_redo)
+
+@app.route('/mapHeaders', methods=['POST'])
+def map_headers():
+    # Import a file kept by check_fields_of_imported_file with the fields
+    # chosen for its unexpected headers; the mappings are remembered for the
+    # next imports, as the GUIs do
+    errors = defaultdict(list)
+    email.email_env_check(errors)
+    values = {"default": 0}
+    user_name = request.form["user_name"]
+    if not check_user(user_name):
+        errors['fatal_error'].append('Unauthorized user. Please contact the database admin')
+        return render_template('index.html', fields=g.schema.fields, errors=errors, values=values)
+    filepath = os.path.join(os.getcwd(), app.config['UPLOAD_FOLDER'], secure_filename(request.form.get("upload", "")))
+    try:
+        imported_fields = stream_import.read_header(filepath)
+    except (OSError, ValueError):
+        errors['fatal_error'].append('The uploaded file is gone. Please import it again.')
+        return render_template('index.html', fields=g.schema.fields, errors=errors, values=values)
+    selected_mapping = {request.form.get(f"header_{n}"): request.form.get(f"field_{n}")
+                        for n in range(request.form.get("mapped", 0, type=int))}
+    selected_mapping = {header: field for header, field in selected_mapping.items()
+                        if header in imported_fields and field in g.schema.fields}
+    ALIASES.record(selected_mapping)
+    header_mapping = ALIASES.lookup(imported_fields, g.schema.fields)
+    header_mapping.update(selected_mapping)
+    return import_file(filepath, imported_fields, errors, values, header_mapping, user_name)
 
 @app.route('/', methods=['GET', 'POST'])
 def index():
@@ -271,8 +414,7 @@ def index():
         user_name = request.form["user_name"]
         if not check_user(user_name):
             errors['fatal_error'].append('Unauthorized user. Please contact the database admin')
-            return render_template('index.html', \
-                tables=[data.to_html(classes='data', header="true")], fields=FIELDS, errors=errors, values=values, df=data)
+            return render_template('index.html', fields=g.schema.fields, errors=errors, values=values)
         if 'file' in request.files:
             file = request.files['file']
             if file:
@@ -283,28 +425,25 @@ def index():
                     file.save(filepath)
                 except FileNotFoundError:
                     errors['fatal_error'].append('Please run it in the MetagenoMongo.')
-                    return render_template('index_with_table.html', \
-                        tables=[data.to_html(classes='data', header="true")], errors=errors, df=data)
-                data = read_imported_file(file, filepath, errors)
-                data = clean_imported_file(data)
-                check_fields_of_imported_file(data, filepath, errors, values)
-                data = data.reindex(columns=FIELDS, fill_value='')
-                data_validation.validation_all(FIELDS, OPTIONS, errors, data) 
-                data = add_no_col(data)
-                os.remove(filepath)
-                return render_template('index_with_table.html', \
-                    tables=[data.to_html(classes='data', header="true")], \
-                    errors=errors, df=data, user_name=user_name)
+                    return render_template('index_with_table.html', errors=errors, columns=[], rows=[])
+                try:
+                    imported_fields = stream_import.read_header(filepath)
+                except ValueError:
+                    os.remove(filepath)
+                    errors['fatal_error'].append('Invalid file type')
+                    return render_template('index.html', fields=g.schema.fields, errors=errors, values=values)
+                header_mapping = ALIASES.lookup(imported_fields, g.schema.fields)
+                return import_file(filepath, imported_fields, errors, values, header_mapping, user_name)
         # Handle manual data entry
         if request.form:
             values = MultiDict(request.form)
             if len(values) == 1: # importing file is not selected
                 errors['fatal_error'].append('Choose an importing file.')
-                return render_template('index.html', tables=[],\
-                                        fields=FIELDS, errors=errors, values=values)
+                return render_template('index.html', \
+                                        fields=g.schema.fields, errors=errors, values=values)
             organize_form_data(values)
-            result = data_validation.data_assign(FIELDS, values)
-            data = pd.DataFrame(result["data"],columns=FIELDS)
+            result = data_validation.data_assign(g.schema.fields, values)
+            data = pd.DataFrame(result["data"],columns=g.schema.fields)
             user_name = request.form["user_name"]
             action = request.form["action"]
             if action == "new_line":
@@ -312,12 +451,11 @@ def index():
                 if empty_check(new_data):
                     data.loc[len(data)] = new_data
                     data.at[len(data)-1,'sampleID'] = ''
-            data_validation.validation_all( FIELDS, OPTIONS, errors, data)
+            snapshot_id = validate_data(errors, data)
             data = add_no_col(data)
-            return render_template('index_with_table.html', \
-                    tables=[data.to_html(classes='data', header="true")], errors=errors, df=data, user_name=user_name)
+            return render_table(data, errors, user_name, snapshot_id)
     
-    return render_template('index.html', tables=[], fields=FIELDS, errors=errors, values=values)
+    return render_template('index.html', fields=g.schema.fields, errors=errors, values=values)
 
 if __name__ == '__main__':
     app.run(debug=True, host="0.0.0.0")
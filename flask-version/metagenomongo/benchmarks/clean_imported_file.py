@@ -0,0 +1,37 @@
+# Compare the applymap based cleaning with module/stream_import.py on a
+# table shaped like working_test_dept_sample_db.csv.
+# Run in flask-version/metagenomongo: python benchmarks/clean_imported_file.py [rows]
+import os
+import sys
+import time
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import module.stream_import as stream_import
+
+SAMPLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'working_test_dept_sample_db.csv')
+
+def clean_with_applymap(data):
+    data.columns = data.columns.str.strip()
+    data = data.map(lambda x: x.strip() if isinstance(x, str) else x)
+    data = data.fillna('')
+    data = data[~(data == '').all(axis=1)]
+    return data
+
+def timed(clean, data):
+    start = time.perf_counter()
+    result = clean(data.copy())
+    return time.perf_counter() - start, result
+
+if __name__ == '__main__':
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    sample = pd.read_csv(SAMPLE, dtype=str)
+    # Pad some cells so there is something to strip
+    sample.iloc[::3, 1] = ' ' + sample.iloc[::3, 1] + ' '
+    data = pd.concat([sample] * (rows // len(sample) + 1), ignore_index=True).iloc[:rows]
+    before, expected = timed(clean_with_applymap, data)
+    after, result = timed(stream_import.clean_imported_file, data)
+    assert result.equals(expected)
+    print(f"{rows} rows x {data.shape[1]} columns")
+    print(f"applymap:   {before:.3f}s")
+    print(f"vectorized: {after:.3f}s ({before / after:.1f}x)")
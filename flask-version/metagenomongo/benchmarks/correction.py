@@ -0,0 +1,60 @@
+# Compare the former repeat-until-unchanged loop of metagenomongo.py with the
+# single pass on a table shaped like working_test_dept_sample_db.csv. That one
+# pass reaches the fixed point is tested in tests/test_rules.py.
+# Run in flask-version/metagenomongo: python benchmarks/correction.py [rows]
+import os
+import re
+import sys
+import time
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import module.schema as schema
+import module.correction as correction
+
+SAMPLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'working_test_dept_sample_db.csv')
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '.metagenomongo.csv')
+
+def correct_until_unchanged(data, headers):
+    # The correction loop metagenomongo.py used: whole passes over the table
+    # until one changes nothing
+    corrected_count = 0
+    correction_applied = True
+    while correction_applied:
+        correction_applied = False
+        for row_index, row in enumerate(data):
+            for col_index, cell in enumerate(row):
+                corrected_cell = cell.strip(',; ')
+                corrected_cell = re.sub(r'\s+', ' ', corrected_cell)
+                corrected_cell = re.sub(r',\s*(\S)', r'; \1', corrected_cell)
+                if headers[col_index] == "locality":
+                    corrected_cell = re.sub(r':(?!\s)', ': ', corrected_cell)
+                if headers[col_index] == "source_type":
+                    corrected_cell = corrected_cell.capitalize()
+                if headers[col_index] == "if_repeated":
+                    if corrected_cell.lower() == "yes":
+                        corrected_cell = "y"
+                    elif corrected_cell.lower() == "no":
+                        corrected_cell = "n"
+                if corrected_cell != cell:
+                    data[row_index][col_index] = corrected_cell
+                    corrected_count += 1
+                    correction_applied = True
+    return corrected_count
+
+if __name__ == '__main__':
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    current = schema.SchemaCache(SCHEMA_FILE).get()
+    sample = pd.read_csv(SAMPLE, dtype=str, keep_default_na=False).reindex(columns=current.fields, fill_value='')
+    # Give the separators something to correct
+    sample.iloc[::3, current.field_index['species']] = sample.iloc[::3, current.field_index['species']] + ' ,, sp.'
+    data = pd.concat([sample] * (rows // len(sample) + 1), ignore_index=True).iloc[:rows]
+    start = time.perf_counter()
+    correct_until_unchanged(data.values.tolist(), current.fields)
+    before = time.perf_counter() - start
+    start = time.perf_counter()
+    _, changes = correction.correct_table(data, current.column_rules)
+    after = time.perf_counter() - start
+    print(f"{rows} rows x {data.shape[1]} columns, {changes.rows.size} corrected cells")
+    print(f"until unchanged: {before:.3f}s")
+    print(f"single pass:     {after:.3f}s ({before / after:.1f}x)")
@@ -0,0 +1,59 @@
+import json
+import logging
+import os
+import threading
+
+def alias_file(schema_file):
+    # The aliases of a .metagenomongo.csv are kept next to it
+    return os.path.join(os.path.dirname(schema_file), '.metagenomongo.aliases.json')
+
+class AliasStore:
+    # Header mappings accepted by users (source header -> schema field),
+    # stored as a JSON object so later imports of files with the same headers
+    # are mapped without asking again. The file is read again when another
+    # process changed it.
+    def __init__(self, filename):
+        self.filename = filename
+        self.stat = None
+        self.aliases = {}
+        self.lock = threading.Lock()
+
+    def load(self):
+        try:
+            stat = os.stat(self.filename)
+            stat = (stat.st_size, stat.st_mtime_ns)
+        except FileNotFoundError:
+            return {}
+        if stat != self.stat:
+            try:
+                with open(self.filename, encoding='utf-8') as f:
+                    self.aliases = json.load(f)
+            except (OSError, ValueError) as e:
+                logging.error(f"{self.filename} could not be read: {e}")
+            self.stat = stat
+        return self.aliases
+
+    def lookup(self, headers, fields):
+        # {header: field} for the headers with an alias to one of fields
+        with self.lock:
+            aliases = self.load()
+        fields = set(fields)
+        return {header: aliases[header] for header in headers if aliases.get(header) in fields}
+
+    def record(self, mapping):
+        # Remember the accepted {header: field} mappings
+        mapping = {header: field for header, field in mapping.items() if header and field and header != field}
+        if not mapping:
+            return
+        with self.lock:
+            aliases = dict(self.load())
+            aliases.update(mapping)
+            try:
+                with open(self.filename + '.tmp', 'w', encoding='utf-8') as f:
+                    json.dump(aliases, f, indent=1, sort_keys=True)
+                os.replace(self.filename + '.tmp', self.filename)
+            except OSError as e:
+                logging.error(f"{self.filename} could not be written: {e}")
+                return
+            self.aliases = aliases
+            self.stat = None
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+
+import module.validation as data_validation
+import module.journal as journal
+
+def correct_table(data, column_rules, progress=None):
+    # Apply the corrections of the validation to every column of the table
+    # (laid out as the fields of column_rules). Returns the corrected table
+    # and the changed cells as journal.CellChanges; rows are positions in
+    # data. progress(done, total) is called after each column.
+    corrected = data.copy()
+    rows, cols, old_values, new_values = [], [], [], []
+    for done, rule in enumerate(column_rules, 1):
+        if progress is not None:
+            progress(done, len(column_rules))
+        column = data.iloc[:, rule.index].reset_index(drop=True)
+        new_column = data_validation.correct_column(rule, column)
+        if new_column is column:
+            continue
+        changed = np.flatnonzero(column.to_numpy() != new_column.to_numpy())
+        if changed.size == 0:
+            continue
+        corrected.isetitem(rule.index, new_column.to_numpy())
+        rows.append(changed)
+        cols.append(np.full(changed.size, rule.index))
+        old_values.append(column.to_numpy()[changed])
+        new_values.append(new_column.to_numpy()[changed])
+    if not rows:
+        return corrected, journal.cell_changes([], [], [], [])
+    return corrected, journal.cell_changes(*(np.concatenate(a) for a in (rows, cols, old_values, new_values)))
+
+def drop_empty_rows(data):
+    # The table without its empty rows, and the deletion of each of them
+    # (last first, so each index is the row's position when it is deleted)
+    empty = (data == '').all(axis=1).to_numpy()
+    deletions = [journal.RowDelete(int(index), data.iloc[index].tolist()) for index in np.flatnonzero(empty)[::-1]]
+    return data[~empty].reset_index(drop=True), deletions
+
+def correct_and_validate(fields, options, column_rules, data, progress=None):
+    # The correction run by the GUIs: corrects the table, removes the empty
+    # rows and validates the result with the rules of the web version.
+    # Returns the corrected table, the journal changes turning data into it
+    # (the corrected cells, then the deleted rows) and the [row, field,
+    # message] errors.
+    data = pd.DataFrame(data, columns=fields, dtype=object).fillna('')
+    corrected, cells = correct_table(data, column_rules, progress)
+    corrected, deletions = drop_empty_rows(corrected)
+    changes = [cells, *deletions]
+    error_list = []
+    if not corrected.empty:
+        errors = {}
+        data_validation.validation_all(fields, options, errors, corrected, column_rules)
+        error_list = errors['fatal_error']
+    return corrected, changes, error_list
@@ -2,50 +2,159 @@ import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import os
+import threading
+import time
+import logging
+
+# SMTP server, Gmail by default. Set SMTP_STARTTLS=no to test against a local
+# debugging server (python -m aiosmtpd -n -l localhost:8025)
+SMTP_HOST = os.getenv('SMTP_HOST', 'smtp.gmail.com')
+SMTP_PORT = int(os.getenv('SMTP_PORT', '587'))
+SMTP_STARTTLS = os.getenv('SMTP_STARTTLS', 'yes') != 'no'
+SMTP_TIMEOUT = 30 # seconds
+POOL_SIZE = 2 # idle connections kept open
+MAX_IDLE = 5 * 60 # seconds before an idle connection is closed
+# Uploads notified within this many seconds of the first one are sent in one email
+DIGEST_WINDOW = float(os.getenv('EMAIL_DIGEST_WINDOW', '60'))
 
 def email_env_check(errors):
     if os.getenv('RECIPIENT_EMAIL') == None:
         errors['warning'].append('RECIPIENT_EMAIL is not set. The automatic email notification is turned off.\
                                  Please notify the database admins to let them know about the uploaded file.')
 
-def send_email(file_name, remote_path):
-    # Set up the MIME
-    sender_email = os.getenv('SENDER_EMAIL')
-    recipient_email = os.getenv('RECIPIENT_EMAIL')
-    try:
-        recipient_email = recipient_email.split(',')
-        print(recipient_email)
-    except:
-        print(f"An error occurred: check RECIPIENT_EMAIL is set correctly")
-        return
-    sender_password = os.getenv('SENDER_PASSWORD')
-    message = MIMEMultipart()
-    message['Subject'] = f"The file {file_name} upload"
-    message['From'] = sender_email
-    
+class SMTPPool:
+    # Logged-in SMTP connections reused between emails. A connection is
+    # checked with NOOP before it is handed out and replaced when the server
+    # dropped it; connections idle for more than MAX_IDLE are closed.
+    def __init__(self, host, port, starttls, size=POOL_SIZE):
+        self.host = host
+        self.port = port
+        self.starttls = starttls
+        self.size = size
+        self.idle = [] # (connection, time it was returned)
+        self.lock = threading.Lock()
 
-    # Add body to email
-    message.attach(MIMEText(f"The file {file_name} has been uploaded to the {remote_path}.", 'plain'))
+    def connect(self, sender_email, sender_password):
+        server = smtplib.SMTP(self.host, self.port, timeout=SMTP_TIMEOUT)
+        try:
+            if self.starttls:
+                server.starttls()  # Enable security
+            if sender_password:
+                server.login(sender_email, sender_password)
+        except (smtplib.SMTPException, OSError):
+            close(server)
+            raise
+        return server
 
-    # Create SMTP session
+    def get(self, sender_email, sender_password):
+        while True:
+            with self.lock:
+                if not self.idle:
+                    break
+                server, returned = self.idle.pop()
+            if time.monotonic() - returned < MAX_IDLE and healthy(server):
+                return server
+            close(server)
+        return self.connect(sender_email, sender_password)
+
+    def put(self, server):
+        with self.lock:
+            if len(self.idle) < self.size:
+                self.idle.append((server, time.monotonic()))
+                return
+        close(server)
+
+    def discard(self, server):
+        close(server)
+
+def healthy(server):
     try:
-        # Use Gmail's SMTP server
-        server = smtplib.SMTP('smtp.gmail.com', 587)
-        server.starttls()  # Enable security
-        # Login to the server
-        server.login(sender_email, sender_password)
-        # Send the email
-        text = message.as_string()
-        for recipient in recipient_email:
+        return server.noop()[0] == 250
+    except (smtplib.SMTPException, OSError):
+        return False
+
+def close(server):
+    try:
+        server.quit()
+    except (smtplib.SMTPException, OSError):
+        server.close()
+
+class Notifier:
+    # Sends the upload notifications from a background thread. The uploads
+    # notified within DIGEST_WINDOW seconds of the first pending one are
+    # coalesced into one digest email.
+    def __init__(self, pool, window=DIGEST_WINDOW):
+        self.pool = pool
+        self.window = window
+        self.pending = [] # (file name, remote path)
+        self.condition = threading.Condition()
+        self.thread = None
+
+    def notify(self, file_name, remote_path):
+        with self.condition:
+            self.pending.append((file_name, remote_path))
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.work, daemon=True)
+                self.thread.start()
+            self.condition.notify()
+
+    def work(self):
+        while True:
+            with self.condition:
+                while not self.pending:
+                    self.condition.wait()
+            # Wait for the other uploads of the window
+            time.sleep(self.window)
+            with self.condition:
+                uploads, self.pending = self.pending, []
+            # Any failure loses this digest only: the thread keeps sending
+            # the later ones
             try:
-                message['To'] = recipient
-                server.sendmail(sender_email, recipient, text)
-                print(f"Email sent successfully to {recipient}!")
+                send_digest(self.pool, uploads)
             except Exception as e:
-                print(f"An error occurred while sending the email to {recipient}: {e}")
+                logging.error(f"An error occurred while sending the email: {e}")
 
-    except Exception as e:
-        print(f"An error occurred while sending the email: {e}")
+def digest_message(uploads):
+    if len(uploads) == 1:
+        file_name, remote_path = uploads[0]
+        return f"The file {file_name} upload", f"The file {file_name} has been uploaded to the {remote_path}."
+    lines = [f"The file {file_name} has been uploaded to the {remote_path}." for file_name, remote_path in uploads]
+    return f"{len(uploads)} files uploaded", "\n".join(lines)
 
-    finally:
-        server.quit()
+def send_digest(pool, uploads):
+    sender_email = os.getenv('SENDER_EMAIL')
+    recipient_email = os.getenv('RECIPIENT_EMAIL')
+    if not recipient_email:
+        logging.error("An error occurred: check RECIPIENT_EMAIL is set correctly")
+        return
+    recipient_email = recipient_email.split(',')
+    sender_password = os.getenv('SENDER_PASSWORD')
+    subject, body = digest_message(uploads)
+    try:
+        server = pool.get(sender_email, sender_password)
+    except (smtplib.SMTPException, OSError) as e:
+        logging.error(f"An error occurred while sending the email: {e}")
+        return
+    for recipient in recipient_email:
+        # Set up the MIME
+        message = MIMEMultipart()
+        message['Subject'] = subject
+        message['From'] = sender_email
+        message['To'] = recipient
+        message.attach(MIMEText(body, 'plain'))
+        try:
+            server.sendmail(sender_email, recipient, message.as_string())
+            logging.info(f"Email sent successfully to {recipient}!")
+        except smtplib.SMTPRecipientsRefused as e:
+            logging.error(f"An error occurred while sending the email to {recipient}: {e}")
+        except (smtplib.SMTPException, OSError) as e:
+            logging.error(f"An error occurred while sending the email: {e}")
+            pool.discard(server)
+            return
+    pool.put(server)
+
+NOTIFIER = Notifier(SMTPPool(SMTP_HOST, SMTP_PORT, SMTP_STARTTLS))
+
+def send_email(file_name, remote_path):
+    # Queue the notification of an uploaded file
+    NOTIFIER.notify(file_name, remote_path)
@@ -0,0 +1,91 @@
+import io
+import re
+
+import pandas as pd
+
+try:
+    import pyarrow # noqa: F401 (the parquet engine of pandas)
+except ImportError: # optional, only needed to save as parquet
+    pyarrow = None
+
+FORMATS = {
+    'csv': ('.csv', 'text/csv'),
+    'parquet': ('.parquet', 'application/vnd.apache.parquet'),
+}
+# str columns with at most this share of distinct values are dictionary encoded
+DICTIONARY_RATIO = 0.5
+CHUNK_ROWS = 1000 # rows encoded per chunk of a streamed csv
+# A year or a year and month, valid dates of .metagenomongo.csv without a day
+PARTIAL_DATE = re.compile(r'\d{4}(-\d{2})?')
+
+def typed_column(column, datatype):
+    # The column converted to the datatype of .metagenomongo.csv; empty
+    # cells become missing values. A date column with a year or a month
+    # alone is kept as entered: a timestamp would make it the first day.
+    if datatype in ('int', 'float'):
+        numbers = pd.to_numeric(column.where(column != ''), errors='coerce').astype('Float64')
+        if datatype == 'int':
+            return numbers.where(numbers.round() == numbers).astype('Int64')
+        return numbers
+    if datatype == 'date':
+        if column.astype(str).str.fullmatch(PARTIAL_DATE).any():
+            return column
+        return pd.to_datetime(column.where(column != ''), format='ISO8601', utc=True, errors='coerce')
+    return column
+
+def is_low_cardinality(column, option):
+    if option['combobox_type'] == 'fix' and option['options']:
+        return True
+    return len(column) > 0 and column.nunique() <= DICTIONARY_RATIO * len(column)
+
+def typed_table(data, options):
+    # A copy of the table with the int/float/date fields converted and the
+    # low-cardinality str fields (fixed options such as source_type, or few
+    # distinct values such as platform) as categoricals. Returns the table
+    # and the names of the categorical columns.
+    columns = {}
+    categorical = []
+    for field in data.columns:
+        option = options.get(field, {'datatype': 'str', 'options': [], 'combobox_type': ''})
+        column = typed_column(data[field], option['datatype'])
+        if option['datatype'] not in ('int', 'float', 'date') and is_low_cardinality(column, option):
+            column = column.astype('category')
+            categorical.append(field)
+        columns[field] = column
+    return pd.DataFrame(columns, index=data.index), categorical
+
+def to_parquet(data, options):
+    # The table as parquet bytes, written straight into one binary buffer
+    if pyarrow is None:
+        raise RuntimeError("pyarrow is not installed. Run: pip install pyarrow")
+    table, categorical = typed_table(data, options)
+    buffer = io.BytesIO()
+    table.to_parquet(buffer, engine='pyarrow', index=False, use_dictionary=categorical)
+    return buffer.getvalue()
+
+def csv_chunks(data, chunk_rows=CHUNK_ROWS):
+    # The table as utf-8 csv bytes, encoded a chunk of rows at a time so a
+    # large table is never held as one string
+    yield data.iloc[:0].to_csv(index=False).encode('utf-8')
+    for start in range(0, len(data.index), chunk_rows):
+        yield data.iloc[start:start + chunk_rows].to_csv(index=False, header=False).encode('utf-8')
+
+def chunks(data, options, file_format):
+    # The saved file as an iterable of bytes. Parquet is written at once (its
+    # footer needs the whole table), so a missing pyarrow is raised here and
+    # not in the middle of the download.
+    if file_format == 'parquet':
+        return [to_parquet(data, options)]
+    return csv_chunks(data)
+
+def save(data, options, filename, progress=None):
+    # Write the table to filename: parquet when the name ends in .parquet,
+    # csv otherwise. progress(done, total) is called after each chunk written.
+    file_format = 'parquet' if filename.endswith('.parquet') else 'csv'
+    content = chunks(data, options, file_format)
+    total = 1 if file_format == 'parquet' else 1 + -(-len(data.index) // CHUNK_ROWS)
+    with open(filename, 'wb') as f:
+        for done, chunk in enumerate(content, 1):
+            f.write(chunk)
+            if progress is not None:
+                progress(done, total)
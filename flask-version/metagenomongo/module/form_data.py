@@ -0,0 +1,56 @@
+import json
+import re
+
+import numpy as np
+import pandas as pd
+
+# Name of the table inputs: "<row>_<column>", columns numbered as on the page
+# where column 0 is No and column n is fields[n - 1]
+CELL_KEY = re.compile(r"(\d+)_(\d+)")
+# Columns holding the Duplicate/Delete buttons, never data
+BUTTON_FIELDS = ("Duplicate", "Delete")
+
+def decode_cells(form, fields):
+    # Build the table from the row_col inputs of the form. Rows are ordered by
+    # their number, so rows removed or appended on the page leave no gap and
+    # the order of the form items does not matter; missing cells are empty.
+    rows, cols, values = [], [], []
+    for key, value in form.items():
+        match = CELL_KEY.fullmatch(key)
+        if match is None:
+            continue
+        col = int(match.group(2))
+        if 1 <= col <= len(fields):
+            rows.append(int(match.group(1)))
+            cols.append(col - 1)
+            values.append(value)
+    row_numbers, positions = np.unique(np.array(rows, dtype=np.int64), return_inverse=True)
+    table = np.full((len(row_numbers), len(fields)), "", dtype=object)
+    table[positions, np.array(cols, dtype=np.int64)] = values
+    return clear_buttons(pd.DataFrame(table, columns=fields))
+
+def decode_columns(payload, fields):
+    # Build the table from a JSON object mapping field names to the list of
+    # the values of the column, as posted by the page in the "table" input
+    try:
+        columns = json.loads(payload)
+    except ValueError:
+        raise ValueError("The table could not be read.")
+    if not isinstance(columns, dict) or not all(isinstance(values, list) for values in columns.values()):
+        raise ValueError("The table could not be read.")
+    if len({len(values) for values in columns.values()}) > 1:
+        raise ValueError("The columns of the table have different lengths.")
+    unexpected = [field for field in columns if field not in fields and field != "No"]
+    if unexpected:
+        raise ValueError("The table contains unexpected fields :::" + ",".join(unexpected))
+    length = len(next(iter(columns.values()), []))
+    data = pd.DataFrame({field: pd.Series(columns[field], dtype=object).fillna("").astype(str)
+                         if field in columns else np.full(length, "", dtype=object)
+                         for field in fields})
+    return clear_buttons(data)
+
+def clear_buttons(data):
+    for field in BUTTON_FIELDS:
+        if field in data.columns:
+            data[field] = ""
+    return data
@@ -0,0 +1,88 @@
+import hashlib
+import re
+import threading
+from collections import Counter, OrderedDict
+
+CUTOFF = 0.6 # minimum similarity of a suggested field, as difflib.get_close_matches
+MAX_LAYOUTS = 64 # header rows whose mapping is kept
+
+def normalize(header):
+    return re.sub(r'[^a-z0-9]+', '', str(header).lower())
+
+def trigrams(header):
+    # Trigrams of the normalized header, padded so short headers and the
+    # first and last letters count
+    text = f"  {normalize(header)} "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def layout_key(header_row):
+    # Hash of a header row, the key of the cached mapping of its layout
+    return hashlib.sha1("\x1f".join("" if header is None else str(header) for header in header_row).encode()).hexdigest()
+
+class HeaderResolver:
+    # Maps the columns of imported files to the schema fields. The trigrams
+    # of the fields are indexed once, so scoring a header only visits the
+    # fields sharing a trigram with it (Dice coefficient of the trigram sets).
+    # The mapping of a header row is computed once and cached by the hash of
+    # the row, files exported with the same layout reuse it.
+    def __init__(self, fields, cutoff=CUTOFF):
+        self.fields = list(fields)
+        self.field_set = set(self.fields)
+        self.cutoff = cutoff
+        self.field_trigrams = [trigrams(field) for field in self.fields]
+        self.index = {} # trigram -> field positions
+        for position, grams in enumerate(self.field_trigrams):
+            for gram in grams:
+                self.index.setdefault(gram, []).append(position)
+        self.layouts = OrderedDict() # layout_key -> mapping
+        self.lock = threading.Lock()
+
+    def scores(self, header):
+        # [(similarity, field)] of the fields sharing a trigram with header, best first
+        grams = trigrams(header)
+        shared = Counter(position for gram in grams for position in self.index.get(gram, ()))
+        scored = sorted((-2 * count / (len(grams) + len(self.field_trigrams[position])), position)
+                        for position, count in shared.items())
+        return [(-score, self.fields[position]) for score, position in scored]
+
+    def suggest(self, header):
+        # The closest field, or None when none is similar enough
+        if header in self.field_set:
+            return header
+        scored = self.scores(header)
+        if scored and scored[0][0] >= self.cutoff:
+            return scored[0][1]
+        return None
+
+    def resolve(self, header_row):
+        # {source header: field or None} for the columns of a file; a field is
+        # given to the first (best scored) column only
+        key = layout_key(header_row)
+        with self.lock:
+            if key in self.layouts:
+                self.layouts.move_to_end(key)
+                return dict(self.layouts[key])
+        mapping = {header: header for header in header_row if header in self.field_set}
+        taken = set(mapping.values())
+        candidates = []
+        for header in header_row:
+            if header is None or header in mapping:
+                continue
+            mapping[header] = None
+            candidates.extend((score, header, field) for score, field in self.scores(header) if score >= self.cutoff)
+        for score, header, field in sorted(candidates, key=lambda item: -item[0]):
+            if mapping[header] is None and field not in taken:
+                mapping[header] = field
+                taken.add(field)
+        with self.lock:
+            self.layouts[key] = mapping
+            while len(self.layouts) > MAX_LAYOUTS:
+                self.layouts.popitem(last=False)
+        return dict(mapping)
+
+def remap(data, mapping, fields):
+    # Rename the columns of data to their fields in one reindex: columns
+    # mapped to None and repeated fields are dropped, missing fields are empty
+    data = data.rename(columns={header: field for header, field in mapping.items() if field is not None})
+    data = data.loc[:, ~data.columns.duplicated()]
+    return data.reindex(columns=fields, fill_value='')
@@ -0,0 +1,133 @@
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict, defaultdict
+
+import pandas as pd
+
+import module.validation as data_validation
+import module.uniqueness as uniqueness
+import module.journal as journal
+
+MAX_SNAPSHOTS = 32 # validated tables kept in memory, least recently used are dropped
+TABLE_TTL = 4 * 60 * 60 # seconds a paginated table is kept after its last use
+MAX_TABLES = 256 # paginated tables kept in memory, least recently used are dropped
+
+class ValidationSnapshot:
+    # The last validated table of one editing session: the per-row errors and
+    # corrected key values keyed by a content hash of the row, and the
+    # uniqueness index behind the cross-row checks. Only rows whose hash is not
+    # in the snapshot are validated again; the uniqueness index is patched with the
+    # rows that appeared or disappeared since the previous submission. Its row
+    # ids are (row hash, n) for the n-th row with that content.
+    def __init__(self, fields, options, column_rules):
+        self.fields = fields
+        self.options = options
+        self.column_rules = column_rules
+        self.rows = {} # row hash -> (errors as (field, message) pairs, key values)
+        self.hashes = Counter() # row hash -> number of rows with that content
+        self.index = uniqueness.UniquenessIndex()
+        self.lock = threading.Lock()
+
+    def validate_new_rows(self, df, hashes):
+        # Validate each distinct unseen row once and file its errors under its hash
+        new = ~hashes.duplicated() & ~hashes.isin(self.rows.keys())
+        if not new.any():
+            return
+        new_hashes = hashes[new].tolist()
+        cell_errors, keys = data_validation.validate_rows(self.fields, self.column_rules, df[new.to_numpy()])
+        per_row = [[] for _ in new_hashes]
+        for row_index, field, message in cell_errors:
+            per_row[row_index].append((field, message))
+        for row_hash, row_errors, row_keys in zip(new_hashes, per_row, keys.itertuples(index=False, name=None)):
+            self.rows[row_hash] = (row_errors, row_keys)
+
+    def patch_index(self, hashes):
+        current = Counter(hashes.tolist())
+        for row_hash in current.keys() | self.hashes.keys():
+            old, new = self.hashes[row_hash], current[row_hash]
+            for n in range(new, old):
+                self.index.remove((row_hash, n))
+            for n in range(old, new):
+                self.index.add((row_hash, n), *self.rows[row_hash][1])
+        self.hashes = current
+
+    def validate(self, errors, df_temp, reference=None):
+        # Same contract and result as data_validation.validation_all
+        df_temp = df_temp[~(df_temp == '').all(axis=1)]
+        hashes = pd.util.hash_pandas_object(df_temp, index=False).reset_index(drop=True)
+        with self.lock:
+            self.validate_new_rows(df_temp, hashes)
+            self.patch_index(hashes)
+            error_list = []
+            if df_temp.empty:
+                error_list.append([0, "", "Empty data."])
+            positions = defaultdict(list)
+            for row_index, row_hash in enumerate(hashes.tolist()):
+                error_list.extend([row_index, field, message] for field, message in self.rows[row_hash][0])
+                positions[row_hash].append(row_index)
+            error_list.extend(data_validation.duplicate_errors(self.index, lambda row: positions[row[0]][row[1]]))
+            if reference is not None:
+                keys = (self.rows[row_hash][1] for row_hash in hashes.tolist())
+                error_list.extend(reference.collisions(keys, data_validation.has_id(df_temp)))
+            # Forget rows that are no longer in the table
+            self.rows = {row_hash: self.rows[row_hash] for row_hash in self.hashes}
+        errors['fatal_error'] = error_list
+
+snapshots = OrderedDict()
+snapshots_lock = threading.Lock()
+
+def get_snapshot(snapshot_id, fields, options, column_rules):
+    # Return (snapshot_id, snapshot) for the session, starting a new one when
+    # the id is unknown or expired, or the rules changed since
+    with snapshots_lock:
+        if snapshot_id in snapshots and snapshots[snapshot_id].column_rules is column_rules:
+            snapshots.move_to_end(snapshot_id)
+            return snapshot_id, snapshots[snapshot_id]
+        snapshot_id = uuid.uuid4().hex
+        snapshots[snapshot_id] = ValidationSnapshot(fields, options, column_rules)
+        while len(snapshots) > MAX_SNAPSHOTS:
+            snapshots.popitem(last=False)
+        return snapshot_id, snapshots[snapshot_id]
+
+class PagedTable:
+    # The rows of a table too large to render in one page, edited through
+    # /rows, and the journal of those edits
+    def __init__(self, table):
+        self.table = table
+        self.journal = journal.Journal()
+        self.lock = threading.Lock()
+
+# Kept apart from the snapshots: a paginated table holds the only copy of the
+# user's edits, so it is dropped after TABLE_TTL unused and not because
+# other sessions validated tables meanwhile
+tables = OrderedDict() # table id -> (PagedTable, time of last use)
+tables_lock = threading.Lock()
+
+def expire_tables(now):
+    while tables and (len(tables) > MAX_TABLES or now - next(iter(tables.values()))[1] > TABLE_TTL):
+        tables.popitem(last=False)
+
+def store_table(table_id, table):
+    # Keep the table under table_id, or a new id when it is unknown; a new
+    # table starts a new journal. Returns the id.
+    now = time.monotonic()
+    with tables_lock:
+        if table_id not in tables:
+            table_id = uuid.uuid4().hex
+        tables[table_id] = (PagedTable(table), now)
+        tables.move_to_end(table_id)
+        expire_tables(now)
+        return table_id
+
+def find_table(table_id):
+    # Return the paginated table, or None when it is unknown or expired
+    now = time.monotonic()
+    with tables_lock:
+        expire_tables(now)
+        if table_id not in tables:
+            return None
+        table = tables[table_id][0]
+        tables[table_id] = (table, now)
+        tables.move_to_end(table_id)
+        return table
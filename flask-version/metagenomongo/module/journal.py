@@ -0,0 +1,156 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+MAX_STEPS = 100 # steps kept for undo
+
+# Cells set from old to new values, as parallel arrays (rows and columns are
+# positions), row by row
+CellChanges = namedtuple('CellChanges', ['rows', 'cols', 'old', 'new'])
+# A row inserted at or deleted from a position, with its values
+RowInsert = namedtuple('RowInsert', ['index', 'values'])
+RowDelete = namedtuple('RowDelete', ['index', 'values'])
+# The whole table replaced (import, clear): old and new are the states the
+# table returns and restores, so no rows are copied
+TableReplace = namedtuple('TableReplace', ['old', 'new'])
+# One user action (an edit, a delete, a correction pass), undone and redone
+# as a whole
+Step = namedtuple('Step', ['label', 'changes'])
+
+def cell_changes(rows, cols, old, new):
+    # The cells whose value changed, in row order
+    rows, cols = np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64)
+    old, new = np.asarray(old, dtype=object), np.asarray(new, dtype=object)
+    changed = np.flatnonzero(old != new)
+    order = changed[np.lexsort((cols[changed], rows[changed]))]
+    return CellChanges(rows[order], cols[order], old[order], new[order])
+
+def is_empty(change):
+    return isinstance(change, CellChanges) and change.rows.size == 0
+
+def apply(change, table):
+    if isinstance(change, CellChanges):
+        table.set_cells(change.rows, change.cols, change.new)
+    elif isinstance(change, RowInsert):
+        table.insert_row(change.index, change.values)
+    elif isinstance(change, RowDelete):
+        table.delete_row(change.index)
+    else:
+        table.restore(change.new)
+
+def revert(change, table):
+    if isinstance(change, CellChanges):
+        table.set_cells(change.rows, change.cols, change.old)
+    elif isinstance(change, RowInsert):
+        table.delete_row(change.index)
+    elif isinstance(change, RowDelete):
+        table.insert_row(change.index, change.values)
+    else:
+        table.restore(change.old)
+
+def count_cells(step):
+    return sum(change.rows.size for change in step.changes if isinstance(change, CellChanges))
+
+def cells(step):
+    # (row, column, old value, new value) of the cells a step changed
+    for change in step.changes:
+        if isinstance(change, CellChanges):
+            yield from zip(change.rows.tolist(), change.cols.tolist(), change.old, change.new)
+
+class Journal:
+    # The edits of a table as a list of steps holding only what changed, so
+    # undoing or redoing a step costs the size of its changes and no copy of
+    # the table is kept. The table is any object with set_cells(rows, cols,
+    # values), insert_row(index, values), delete_row(index), and state() and
+    # restore(state) for TableReplace.
+    def __init__(self, limit=MAX_STEPS):
+        self.limit = limit
+        self.done = [] # steps that can be undone, oldest first
+        self.undone = [] # steps that can be redone, most recently undone last
+
+    def record(self, label, changes):
+        # Record a step whose changes were applied to the table; a new step
+        # drops the steps that were undone
+        changes = tuple(change for change in changes if not is_empty(change))
+        if not changes:
+            return None
+        step = Step(label, changes)
+        self.done.append(step)
+        del self.done[:-self.limit]
+        self.undone.clear()
+        return step
+
+    def perform(self, label, changes, table):
+        # Apply the changes to the table in order and record them as one step
+        changes = list(changes)
+        for change in changes:
+            apply(change, table)
+        return self.record(label, changes)
+
+    def undo(self, table):
+        if not self.done:
+            return None
+        step = self.done.pop()
+        for change in reversed(step.changes):
+            revert(change, table)
+        self.undone.append(step)
+        return step
+
+    def redo(self, table):
+        if not self.undone:
+            return None
+        step = self.undone.pop()
+        for change in step.changes:
+            apply(change, table)
+        self.done.append(step)
+        return step
+
+    def clear(self):
+        self.done.clear()
+        self.undone.clear()
+
+class FrameTable:
+    # A DataFrame edited through a Journal; rows and columns are positions
+    def __init__(self, frame):
+        self.frame = frame
+
+    def set_cells(self, rows, cols, values):
+        for row, col, value in zip(rows, cols, values):
+            self.frame.iat[row, col] = value
+
+    def insert_row(self, index, values):
+        row = pd.DataFrame([list(values)], columns=self.frame.columns)
+        self.frame = pd.concat([self.frame.iloc[:index], row, self.frame.iloc[index:]], ignore_index=True)
+
+    def delete_row(self, index):
+        self.frame = self.frame.drop(index=self.frame.index[index]).reset_index(drop=True)
+
+    def state(self):
+        return self.frame
+
+    def restore(self, state):
+        self.frame = state
+
+class RowsTable:
+    # A list of row lists edited through a Journal, changed in place. Its
+    # state is a shallow copy: the rows themselves are not copied, so every
+    # change of the rows must go through the journal too.
+    def __init__(self, rows):
+        self.rows = rows
+
+    def set_cells(self, rows, cols, values):
+        for row, col, value in zip(rows, cols, values):
+            self.rows[row][col] = value
+
+    def insert_row(self, index, values):
+        self.rows.insert(index, list(values))
+
+    def delete_row(self, index):
+        del self.rows[index]
+
+    def state(self):
+        return list(self.rows)
+
+    def restore(self, state):
+        self.rows[:] = state
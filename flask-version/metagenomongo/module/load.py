@@ -2,19 +2,33 @@ import os
 import csv
 import pandas as pd
 
+# Optional rule columns that may follow the four mandatory ones
+RULE_COLUMNS = {
+    'Mandatory': 'mandatory', # yes: the cell must not be empty
+    'Allowed Characters': 'charset', # id: alphanumeric characters, hyphens and underscores
+    'Normalizer': 'normalizer', # column specific correction, see module/rules.py
+    'Allow Empty': 'allow_empty', # yes: empty cells are not validated
+}
+
 def load_options(filename):
     if not os.path.exists(filename):
         # sg.popup_error(f"File {filename} not found!")
         return {}
     with open(filename, 'r') as file:
         reader = csv.reader(file)
-        next(reader)  # Skip the header row
+        header = next(reader)  # Skip the header row
+        rule_columns = {RULE_COLUMNS[name.strip()]: index for index, name in enumerate(header)
+                        if name.strip() in RULE_COLUMNS}
         options = {}
         for row in reader:
+            if not row or row[0].startswith("#"): # comment
+                continue
             field = row[0].strip()
             options[field] = {
                 'datatype': row[1], # str, int, float, date
                 'options': row[2].split(',') if row[2] else [], # empty or options within quotation marks
                 'combobox_type': row[3] # fix, dynamic
             }
-    return options
\ No newline at end of file
+            for key, index in rule_columns.items():
+                options[field][key] = row[index].strip() if index < len(row) else ''
+    return options
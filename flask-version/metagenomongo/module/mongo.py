@@ -0,0 +1,80 @@
+import os
+import threading
+
+try:
+    import pymongo
+    from bson import ObjectId
+except ImportError: # optional, only needed to write to the database
+    pymongo = None
+
+import module.uniqueness as uniqueness
+
+# Database the saved tables are written to; unset to only save the csv
+MONGO_URI = os.getenv('META_MONGO_URI')
+MONGO_DB = os.getenv('META_MONGO_DB', 'metagenomongo')
+MONGO_COLLECTION = os.getenv('META_MONGO_COLLECTION', 'samples')
+BATCH_SIZE = 1000 # operations per bulk_write
+MAX_POOL_SIZE = 10 # connections of the shared client
+
+# Columns of the table that are not stored
+SKIPPED_FIELDS = ("Duplicate", "Delete", "No", "_id")
+
+INSERTED, UPDATED, FAILED = "inserted", "updated", "failed"
+
+clients = {}
+clients_lock = threading.Lock()
+
+def enabled():
+    return MONGO_URI is not None
+
+def get_collection(uri=None, db=None, collection=None):
+    # The client is created once per uri and shared by every request; it
+    # keeps its own connection pool
+    if pymongo is None:
+        raise RuntimeError("pymongo is not installed. Run: pip install pymongo")
+    uri = uri or MONGO_URI
+    with clients_lock:
+        if uri not in clients:
+            clients[uri] = pymongo.MongoClient(uri, maxPoolSize=MAX_POOL_SIZE)
+        client = clients[uri]
+    return client[db or MONGO_DB][collection or MONGO_COLLECTION]
+
+def record_key(record):
+    # Documents are matched on _id when the row has one, on
+    # sampleID+run_directory+barcode otherwise
+    _id = record.get("_id", "")
+    if _id:
+        return {"_id": ObjectId(_id) if ObjectId.is_valid(_id) else _id}
+    return {field: record.get(field, "") for field in uniqueness.KEY_FIELDS}
+
+def upsert_operations(data):
+    fields = [field for field in data.columns if field not in SKIPPED_FIELDS]
+    for record in data.to_dict('records'):
+        document = {field: record[field] for field in fields}
+        yield pymongo.UpdateOne(record_key(record), {"$set": document}, upsert=True)
+
+def upsert_table(collection, data, batch_size=BATCH_SIZE):
+    # Insert or update every row of the validated table with unordered bulk
+    # writes. Fully empty rows are skipped, as validation drops them: they
+    # would all match the same empty key. Returns one [row, status, message]
+    # per written row, rows counted from 0 without the empty rows like the
+    # validation errors; status is INSERTED, UPDATED or FAILED.
+    data = data[~(data == '').all(axis=1)]
+    operations = list(upsert_operations(data))
+    results = []
+    for start in range(0, len(operations), batch_size):
+        batch = operations[start:start + batch_size]
+        try:
+            result = collection.bulk_write(batch, ordered=False)
+            upserted, errors = result.upserted_ids, {}
+        except pymongo.errors.BulkWriteError as e:
+            upserted = {item['index']: item['_id'] for item in e.details.get('upserted', [])}
+            errors = {item['index']: item.get('errmsg', '') for item in e.details.get('writeErrors', [])}
+        for index in range(len(batch)):
+            if index in errors:
+                results.append([start + index, FAILED, errors[index]])
+            elif index in upserted:
+                results.append([start + index, INSERTED, str(upserted[index])])
+            else:
+                results.append([start + index, UPDATED, ""])
+    return results
@@ -0,0 +1,171 @@
+import abc
+import hashlib
+import io
+import logging
+import os
+import threading
+import time
+
+import pandas as pd
+
+import module.uniqueness as uniqueness
+
+# Keys of the samples already in the master dataset: a csv/parquet snapshot
+# (META_REFERENCE_PATH) or the database collection (META_MONGO_URI)
+REFERENCE_PATH = os.getenv('META_REFERENCE_PATH')
+REFRESH_INTERVAL = 60 # seconds between two reads of new database records
+FULL_RELOAD_INTERVAL = 60 * 60 # seconds between two full reads of the database keys
+
+KEY_FIELDS = uniqueness.KEY_FIELDS
+
+class ReferenceIndex(abc.ABC):
+    # Hash sets of the sampleIDs and sampleID+run_directory+barcode
+    # combinations of the master dataset. refresh() is cheap when nothing
+    # changed: a file is read again only when its size or mtime changed, and
+    # only the appended lines are read when the file grew and the part read
+    # before is unchanged; a collection is
+    # read again at most every REFRESH_INTERVAL seconds, only the documents
+    # inserted since the last read.
+    def __init__(self):
+        self.sampleIDs = set()
+        self.combinations = set()
+        self.lock = threading.Lock()
+
+    def clear(self):
+        self.sampleIDs = set()
+        self.combinations = set()
+
+    def add_keys(self, keys):
+        # keys: DataFrame with the KEY_FIELDS columns
+        keys = keys.reindex(columns=list(KEY_FIELDS), fill_value="").fillna("").astype(str)
+        keys = keys.apply(lambda column: column.str.strip())
+        keys = keys[keys["sampleID"] != ""]
+        combinations = list(keys.itertuples(index=False, name=None))
+        self.combinations.update(combinations)
+        self.sampleIDs.update(combination[0] for combination in combinations)
+
+    @abc.abstractmethod
+    def refresh(self):
+        # Bring the keys up to date with the master dataset
+        pass
+
+    def collisions(self, keys, has_id):
+        # Error list for the rows whose sample is already in the master
+        # dataset, in row order. keys are the corrected (sampleID,
+        # run_directory, barcode) of each row; rows with an _id are updates of
+        # an existing record and are not checked.
+        self.refresh()
+        error_list = []
+        with self.lock:
+            for row_index, (combination, row_has_id) in enumerate(zip(keys, has_id)):
+                sampleID, run_directory, barcode = combination
+                if row_has_id or sampleID not in self.sampleIDs:
+                    continue
+                if combination in self.combinations:
+                    error_list.append([row_index, "sampleID", "This sampleID+rundirectory+barcode is already in the database"])
+                    continue
+                # A new run of a sample in the database must say which run it is
+                if run_directory == "":
+                    error_list.append([row_index, "run_directory", "run_directory is necessary (the sampleID is already in the database)"])
+                if barcode == "":
+                    error_list.append([row_index, "barcode", "Barcode is necessary (the sampleID is already in the database)"])
+        return error_list
+
+class FileReference(ReferenceIndex):
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self.stat = None # (size, mtime) of the file when it was read
+        self.header = None # first line of the csv
+        self.offset = 0 # bytes of the csv read so far
+        self.prefix = None # hash of those bytes
+
+    def refresh(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        with self.lock:
+            if self.stat == (stat.st_size, stat.st_mtime_ns):
+                return
+            if os.path.splitext(self.path)[1] == '.parquet':
+                self.clear()
+                self.add_keys(pd.read_parquet(self.path, columns=list(KEY_FIELDS)))
+            else:
+                self.read_csv(stat.st_size)
+            self.stat = (stat.st_size, stat.st_mtime_ns)
+
+    def read_csv(self, size):
+        with open(self.path, 'rb') as f:
+            header = f.readline()
+            if header != self.header or size < self.offset or not self.same_prefix(f):
+                # Rewritten: read it all again
+                self.clear()
+                self.header = header
+                self.offset = len(header)
+                self.prefix = hashlib.sha1(header)
+            f.seek(self.offset)
+            new_lines = f.read()
+        # Leave a line still being written for the next refresh
+        end = new_lines.rfind(b'\n') + 1
+        if end == 0:
+            return
+        columns = [name.strip() for name in pd.read_csv(io.BytesIO(self.header), nrows=0).columns]
+        keys = pd.read_csv(io.BytesIO(new_lines[:end]), header=None, names=columns, dtype=str,
+                           usecols=lambda column: column in KEY_FIELDS, keep_default_na=False)
+        self.add_keys(keys)
+        self.prefix.update(new_lines[:end])
+        self.offset += end
+
+    def same_prefix(self, f):
+        # Whether the bytes read so far are unchanged, so the file only grew:
+        # a file rewritten with more rows is read again from the start
+        f.seek(0)
+        prefix = hashlib.sha1()
+        remaining = self.offset
+        while remaining:
+            block = f.read(min(remaining, 1 << 20))
+            if not block:
+                return False
+            prefix.update(block)
+            remaining -= len(block)
+        return prefix.digest() == self.prefix.digest()
+
+class CollectionReference(ReferenceIndex):
+    def __init__(self, collection):
+        super().__init__()
+        self.collection = collection
+        self.last_id = None # largest _id read, ObjectIds grow with the insertion time
+        self.last_read = float('-inf')
+        self.last_full_read = float('-inf')
+
+    def refresh(self):
+        now = time.monotonic()
+        with self.lock:
+            if now - self.last_read < REFRESH_INTERVAL:
+                return
+            query = {}
+            if now - self.last_full_read >= FULL_RELOAD_INTERVAL:
+                self.clear()
+                self.last_id = None
+                self.last_full_read = now
+            elif self.last_id is not None:
+                query = {"_id": {"$gt": self.last_id}}
+            self.last_read = now
+            projection = {field: 1 for field in KEY_FIELDS}
+            try:
+                documents = list(self.collection.find(query, projection).sort("_id", 1))
+            except Exception as e:
+                logging.error(f"Could not read the keys of the database: {e}")
+                return
+            if documents:
+                self.last_id = documents[-1]["_id"]
+                self.add_keys(pd.DataFrame(documents))
+
+def from_environment(mongo):
+    # The reference configured by the environment, or None
+    if REFERENCE_PATH:
+        return FileReference(REFERENCE_PATH)
+    if mongo.enabled():
+        return CollectionReference(mongo.get_collection())
+    return None
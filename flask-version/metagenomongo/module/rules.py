@@ -0,0 +1,142 @@
+import re
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+
+
+DATE_PATTERN = re.compile(r'^\d{4}(-\d{2}(-\d{2}(T\d{2}:\d{2}:\d{2}\.\d{3}Z)?)?)?$')
+SPECIAL_CHAR_PATTERN = re.compile(r'[^a-zA-Z0-9-_]')
+
+# Order of the checks applied to a single cell. Errors are reported row by row,
+# column by column and, within a cell, in this order.
+DATE_CHECK, OPTION_CHECK, NUMBER_CHECK, MANDATORY_CHECK = range(4)
+# Cells of a column a check is evaluated on
+ALL_CELLS, FILLED_CELLS, EMPTY_CELLS = range(3)
+
+# test receives the distinct values of the selected cells and returns a boolean
+# array that is True where the value fails; None means every selected cell fails
+Check = namedtuple('Check', ['order', 'scope', 'test', 'message'])
+ColumnRule = namedtuple('ColumnRule', ['index', 'field', 'normalize', 'checks', 'allow_empty'])
+
+WHITESPACE = re.compile(r'\s+')
+# A comma, with the spaces and commas after it, followed by more text
+COMMA_SEPARATOR = re.compile(r',[\s,]*(?=[^\s,])')
+COLON_WITHOUT_SPACE = re.compile(r':(?=\S)')
+
+# The normalizers correct a single value and are applied in the order below,
+# each one leaving the value in a form none of them changes again:
+#   collapse_whitespace - no whitespace but single spaces
+#   strip_separators - no ',', ';' or space at either end (a value ends on
+#     text, so every comma left is followed by text)
+#   semicolon_separators - no comma at all: each comma with the spaces and
+#     commas after it becomes '; ' before the following text
+#   colon_space, capitalize, yes_no - a column specific step that only adds
+#     a space between a colon and text, changes the case or maps a value
+# so applying them once reaches the fixed point, no value needs a second pass.
+def collapse_whitespace(value):
+    return WHITESPACE.sub(' ', value)
+
+def strip_separators(value):
+    return value.strip(',; ')
+
+def semicolon_separators(value):
+    return COMMA_SEPARATOR.sub('; ', value)
+
+def colon_space(value):
+    return COLON_WITHOUT_SPACE.sub(': ', value)
+
+def capitalize(value):
+    return value.capitalize()
+
+def yes_no(value):
+    lowered = value.lower()
+    return "y" if lowered == "yes" else "n" if lowered == "no" else value
+
+def compose(normalizers):
+    # One function running every normalizer of a column on each value it gets
+    # (the distinct values of the column), a single pass over them
+    def normalize(cells):
+        result = []
+        for value in cells:
+            for normalizer in normalizers:
+                value = normalizer(value)
+            result.append(value)
+        return np.array(result, dtype=object)
+    return normalize
+
+COMMON_NORMALIZERS = (collapse_whitespace, strip_separators, semicolon_separators)
+NORMALIZERS = {
+    'colon_space': colon_space,
+    'capitalize': capitalize,
+    'yes_no': yes_no,
+}
+CHARSETS = {
+    'id': (SPECIAL_CHAR_PATTERN, "Only alphanumeric characters, hyphens, and underscores are allowed."),
+}
+
+def is_float(value):
+    try:
+        float(value)
+        return True
+    except ValueError:
+        return False
+
+def invalid_date(cells):
+    # The format, and a date (and time) that exists; YYYY and YYYY-MM are
+    # checked as their first day
+    invalid = ~cells.str.match(DATE_PATTERN.pattern).to_numpy(dtype=bool)
+    if not invalid.all():
+        matched = cells[~invalid]
+        completed = matched.where(matched.str.len() > 10, (matched + '-01-01').str.slice(0, 10))
+        invalid[~invalid] = pd.to_datetime(completed, format='ISO8601', utc=True, errors='coerce').isna().to_numpy()
+    return invalid
+
+def invalid_int(cells):
+    return ~cells.str.isdigit().to_numpy(dtype=bool)
+
+def invalid_float(cells):
+    # to_numeric covers the common case; the values it rejects
+    # (e.g. "1_000", "nan") are re-checked with float()
+    invalid = pd.to_numeric(cells, errors='coerce').isna().to_numpy()
+    if invalid.any():
+        invalid[invalid] = [not is_float(value) for value in cells[invalid]]
+    return invalid
+
+def option_check(values):
+    allowed = frozenset(values)
+    return Check(OPTION_CHECK, ALL_CELLS, lambda cells: ~cells.isin(allowed).to_numpy(),
+                 f"Invalid value. Possible values are: '{list(values)}'")
+
+def charset_check(field, charset):
+    if charset not in CHARSETS:
+        raise ValueError(f"Unknown allowed characters '{charset}' for {field}")
+    pattern, message = CHARSETS[charset]
+    return Check(MANDATORY_CHECK, FILLED_CELLS,
+                 lambda cells: cells.str.contains(pattern.pattern).to_numpy(dtype=bool),
+                 f"{field}                        {message}")
+
+def compile_column(index, field, option):
+    normalizers = COMMON_NORMALIZERS
+    if option.get('normalizer'):
+        if option['normalizer'] not in NORMALIZERS:
+            raise ValueError(f"Unknown normalizer '{option['normalizer']}' for {field}")
+        normalizers += (NORMALIZERS[option['normalizer']],)
+    checks = []
+    if option['datatype'] == 'date':
+        checks.append(Check(DATE_CHECK, ALL_CELLS, invalid_date, "Invalid value. Expected data type: date"))
+    if option['combobox_type'] == 'fix' and option['options']:
+        checks.append(option_check(option['options']))
+    if option['datatype'] == 'int':
+        checks.append(Check(NUMBER_CHECK, FILLED_CELLS, invalid_int, "Invalid value. Expected data type: int"))
+    elif option['datatype'] == 'float':
+        checks.append(Check(NUMBER_CHECK, FILLED_CELLS, invalid_float, "Invalid value. Expected data type: float"))
+    if option.get('mandatory') == 'yes':
+        checks.append(Check(MANDATORY_CHECK, EMPTY_CELLS, None, f"{field} is necessary"))
+    if option.get('charset'):
+        checks.append(charset_check(field, option['charset']))
+    return ColumnRule(index, field, compose(normalizers), tuple(checks), option.get('allow_empty') == 'yes')
+
+def compile_rules(fields, options):
+    # Compile the rules of every column once; validation then only walks this
+    # tuple by column index
+    return tuple(compile_column(index, field, options[field]) for index, field in enumerate(fields))
@@ -0,0 +1,58 @@
+import logging
+import os
+import threading
+
+import numpy as np
+
+import module.load as load
+import module.rules as rules
+import module.headers as header_resolution
+
+class Schema:
+    # The fields of .metagenomongo.csv and the lookups derived from them,
+    # computed once per version of the file. Treat it as read-only: a new
+    # Schema replaces it when the file changes.
+    def __init__(self, options):
+        self.options = options
+        self.fields = list(options.keys())
+        self.field_index = {field: index for index, field in enumerate(self.fields)}
+        # Values allowed in the fields restricted to their options
+        self.fixed_options = {field: frozenset(option['options']) for field, option in options.items()
+                              if option['combobox_type'] == 'fix' and option['options']}
+        # datatype -> bool mask over the fields
+        datatypes = np.array([option['datatype'] for option in options.values()], dtype=object)
+        self.datatype_masks = {datatype: datatypes == datatype for datatype in set(datatypes.tolist())}
+        self.column_rules = rules.compile_rules(self.fields, options)
+        # Suggests the fields of imported headers, with its cache of layouts
+        self.resolver = header_resolution.HeaderResolver(self.fields)
+
+    def fields_of_type(self, datatype):
+        mask = self.datatype_masks.get(datatype, np.zeros(len(self.fields), dtype=bool))
+        return [field for field, selected in zip(self.fields, mask) if selected]
+
+class SchemaCache:
+    # The Schema of a .metagenomongo.csv file, parsed again only when the size
+    # or mtime of the file changed. A file that cannot be parsed is reported
+    # and the previous Schema is kept.
+    def __init__(self, filename):
+        self.filename = filename
+        self.stat = None
+        self.schema = Schema({})
+        self.lock = threading.Lock()
+
+    def get(self):
+        try:
+            stat = os.stat(self.filename)
+            stat = (stat.st_size, stat.st_mtime_ns)
+        except FileNotFoundError:
+            stat = None
+        if stat == self.stat:
+            return self.schema
+        with self.lock:
+            if stat != self.stat:
+                try:
+                    self.schema = Schema(load.load_options(self.filename))
+                except (ValueError, IndexError) as e:
+                    logging.error(f"{self.filename} could not be loaded, keeping the previous version: {e}")
+                self.stat = stat
+            return self.schema
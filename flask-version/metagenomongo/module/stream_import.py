@@ -0,0 +1,136 @@
+import os
+import numpy as np
+import pandas as pd
+import openpyxl
+
+import module.validation as data_validation
+import module.uniqueness as uniqueness
+
+CHUNK_SIZE = 5000 # rows read, cleaned and validated at a time
+# Cell values pandas.read_csv/read_excel load as missing by default
+NA_VALUES = frozenset(['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+                       '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'])
+
+def read_header(filepath):
+    # Return the stripped column names of a .csv or .xlsx file
+    ext = os.path.splitext(filepath)[1]
+    if ext == '.csv':
+        header = list(pd.read_csv(filepath, dtype=str, nrows=0).columns)
+    elif ext == '.xlsx':
+        workbook = openpyxl.load_workbook(filepath, read_only=True, data_only=True)
+        try:
+            first_row = next(workbook.active.iter_rows(max_row=1, values_only=True), ())
+        finally:
+            workbook.close()
+        header = excel_header(first_row)
+    else:
+        raise ValueError(f"Unsupported file format: {ext}")
+    return [str(field).strip() for field in header]
+
+def excel_header(first_row):
+    # Name empty header cells like pandas.read_excel does
+    return [f"Unnamed: {index}" if value is None else str(value) for index, value in enumerate(first_row)]
+
+def read_excel_chunks(filepath, chunksize):
+    workbook = openpyxl.load_workbook(filepath, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = excel_header(next(rows, ()))
+        chunk = []
+        for row in rows:
+            # Load as strings, padding short rows
+            row = tuple(row[:len(header)]) + (None,) * (len(header) - len(row))
+            row = [None if value is None else str(value) for value in row]
+            chunk.append([None if value in NA_VALUES else value for value in row])
+            if len(chunk) == chunksize:
+                yield pd.DataFrame(chunk, columns=header)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=header)
+    finally:
+        workbook.close()
+
+def read_chunks(filepath, chunksize=CHUNK_SIZE):
+    # Yield the rows of a .csv or .xlsx file as DataFrames of at most
+    # chunksize rows, so only one chunk is held in memory at a time
+    ext = os.path.splitext(filepath)[1]
+    if ext == '.csv':
+        with pd.read_csv(filepath, dtype=str, chunksize=chunksize) as reader: # Load as strings
+            yield from reader
+    elif ext == '.xlsx':
+        yield from read_excel_chunks(filepath, chunksize)
+    else:
+        raise ValueError(f"Unsupported file format: {ext}")
+
+def count_rows(filepath):
+    # Estimate of the number of rows of a .csv or .xlsx file, to report the
+    # progress of reading it; None when it is not known
+    ext = os.path.splitext(filepath)[1]
+    if ext == '.csv':
+        with open(filepath, 'rb') as f:
+            lines = sum(block.count(b'\n') for block in iter(lambda: f.read(1 << 20), b''))
+        return max(lines - 1, 0)
+    if ext == '.xlsx':
+        workbook = openpyxl.load_workbook(filepath, read_only=True)
+        try:
+            rows = workbook.active.max_row
+        finally:
+            workbook.close()
+        return None if rows is None else max(rows - 1, 0)
+    return None
+
+def clean_imported_file(data):
+    # Strip whitespace from headers
+    data.columns = data.columns.str.strip()
+    # Strip whitespace from data and replace NaN with empty strings, one
+    # string column at a time: each distinct value is stripped once and
+    # broadcast back with the factorized codes (NaN has code -1, which picks
+    # the trailing '')
+    string_columns = (data.dtypes == object).to_numpy()
+    for position in np.flatnonzero(string_columns):
+        codes, uniques = pd.factorize(data.iloc[:, position])
+        cleaned = np.array([value.strip() if isinstance(value, str) else value for value in uniques] + [''], dtype=object)
+        data.isetitem(position, cleaned[codes])
+    if not string_columns.all():
+        data = data.fillna('')
+    # Remove fully empty rows
+    data = data[~(data.to_numpy() == '').all(axis=1)]
+    return data
+
+def prepare_chunk(chunk, fields, header_mapping=None):
+    # Clean a chunk read from a file and lay it out as the table: columns
+    # with a known alias renamed, the fields in order, no empty rows
+    chunk = clean_imported_file(chunk)
+    if header_mapping:
+        chunk = chunk.rename(columns=header_mapping)
+        chunk = chunk.loc[:, ~chunk.columns.duplicated()]
+    chunk = chunk.reindex(columns=fields, fill_value='')
+    return chunk[~(chunk == '').all(axis=1)].reset_index(drop=True)
+
+def validate_chunks(chunks, fields, column_rules, errors, reference=None, header_mapping=None):
+    # Clean, reindex and validate each chunk as it is read and yield it.
+    # Error rows are offset to their position in the whole table, and the
+    # cross-row checks run on a uniqueness index fed chunk by chunk, so
+    # errors['fatal_error'] ends up as validation_all would set it for the
+    # concatenated table. header_mapping renames the columns with a known
+    # alias.
+    error_list = []
+    reference_errors = []
+    index = uniqueness.UniquenessIndex()
+    offset = 0
+    for chunk in chunks:
+        chunk = prepare_chunk(chunk, fields, header_mapping)
+        cell_errors, keys = data_validation.validate_rows(fields, column_rules, chunk)
+        error_list.extend([row_index + offset, field, message] for row_index, field, message in cell_errors)
+        for row_index, row_keys in enumerate(keys.itertuples(index=False, name=None), offset):
+            index.add(row_index, *row_keys)
+        if reference is not None:
+            reference_errors.extend([row_index + offset, field, message] for row_index, field, message
+                                    in reference.collisions(keys.itertuples(index=False, name=None), data_validation.has_id(chunk)))
+        offset += len(chunk)
+        yield chunk
+    if offset == 0:
+        error_list.insert(0, [0, "", "Empty data."])
+    error_list.extend(data_validation.duplicate_errors(index))
+    error_list.extend(reference_errors)
+    errors['fatal_error'] = error_list
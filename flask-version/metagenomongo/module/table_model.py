@@ -0,0 +1,150 @@
+import pandas as pd
+
+PAGE_ROWS = 1000 # rows shown in the table of the GUI at a time
+
+class TableModel:
+    # The rows of the GUI table, stored column by column: the table goes to
+    # and from DataFrames (import, correction, save) without building a list
+    # per row, and a single row is read or written one cell per field.
+    def __init__(self, fields):
+        self.fields = list(fields)
+        self.columns = [[] for _ in self.fields]
+
+    def __len__(self):
+        return len(self.columns[0]) if self.columns else 0
+
+    def row(self, index):
+        return [column[index] for column in self.columns]
+
+    def rows(self, start, stop):
+        return [list(row) for row in zip(*(column[start:stop] for column in self.columns))]
+
+    def set_row(self, index, row):
+        for column, value in zip(self.columns, row):
+            column[index] = value
+
+    def append(self, row):
+        for column, value in zip(self.columns, row):
+            column.append(value)
+        return len(self) - 1
+
+    def delete_row(self, index):
+        for column in self.columns:
+            del column[index]
+
+    def insert_row(self, index, row):
+        for column, value in zip(self.columns, row):
+            column.insert(index, value)
+
+    def set_cells(self, rows, cols, values):
+        for row, col, value in zip(rows, cols, values):
+            self.columns[col][row] = value
+
+    def clear(self):
+        self.columns = [[] for _ in self.fields]
+
+    def state(self):
+        # The columns; replacing the table (clear, load_frame) builds new
+        # lists, so a state keeps the rows it had without a copy. Every other
+        # change must go through the journal, which undoes it in place before
+        # a state is restored.
+        return self.columns
+
+    def restore(self, state):
+        self.columns = state
+
+    def load_frame(self, frame):
+        # Replace the rows with those of a DataFrame laid out as the fields
+        self.columns = [frame[field].tolist() if field in frame.columns else [''] * len(frame.index)
+                        for field in self.fields]
+
+    def to_frame(self):
+        return pd.DataFrame({field: column for field, column in zip(self.fields, self.columns)},
+                            columns=self.fields, dtype=object)
+
+class TablePage:
+    # Shows a page of a TableModel in a PySimpleGUI Table and pushes only the
+    # changed rows to its Treeview. sg.Table names the items of its rows
+    # 1, 2, ... and reports selections as those positions, so the rows of
+    # the page keep these item ids and a change to one row sets, inserts or
+    # deletes that item only; the whole page is redrawn only when the table
+    # is replaced or another page is shown.
+    def __init__(self, element, model, page_rows=PAGE_ROWS):
+        self.element = element
+        self.model = model
+        self.page_rows = page_rows
+        self.start = 0
+        self.shown = 0 # rows of the page in the Treeview
+
+    @property
+    def tree(self):
+        return self.element.Widget
+
+    def stop(self):
+        return min(self.start + self.page_rows, len(self.model))
+
+    def show(self, start=0):
+        # Redraw the page starting at row start (rounded down to a page)
+        start = max(min(start, len(self.model) - 1), 0)
+        self.start = start - start % self.page_rows
+        rows = self.model.rows(self.start, self.stop())
+        self.element.update(values=rows)
+        self.shown = len(rows)
+
+    def show_row(self, index):
+        # Show the page of a row, if it is not the page shown
+        if not self.start <= index < self.start + self.page_rows:
+            self.show(index)
+
+    def selected(self, positions):
+        # Rows of the model selected in the Table
+        return [self.start + position for position in positions]
+
+    def set_item(self, position, row):
+        self.tree.item(str(position + 1), values=row)
+        self.element.Values[position] = row
+
+    def insert_item(self, position, row):
+        iid = self.tree.insert('', 'end', text=row, iid=position + 1, values=row, tag=position)
+        self.element.Values.append(row)
+        self.element.tree_ids.append(iid)
+
+    def delete_item(self, position):
+        self.tree.delete(str(position + 1))
+        del self.element.Values[position]
+        self.element.tree_ids.remove(str(position + 1))
+
+    def changed(self, index):
+        # A row of the model was edited
+        if self.start <= index < self.start + self.shown:
+            self.set_item(index - self.start, self.model.row(index))
+
+    def appended(self, index):
+        # A row was added at the end of the model
+        if self.shown < self.page_rows and index == self.start + self.shown:
+            self.insert_item(self.shown, self.model.row(index))
+            self.shown += 1
+        else:
+            self.show_row(index)
+
+    def deleted(self, index):
+        # A row of the model was deleted: the rows after it on the page move
+        # up one item, and the last item is removed when the page got shorter
+        if index >= self.start + self.shown:
+            return
+        if index < self.start:
+            self.show(self.start)
+            return
+        stop = self.stop()
+        for position, row in enumerate(self.model.rows(index, stop), index - self.start):
+            self.set_item(position, row)
+        while self.shown > stop - self.start:
+            self.shown -= 1
+            self.delete_item(self.shown)
+        if self.shown == 0 and len(self.model):
+            self.show(self.start - self.page_rows)
+
+    def label(self):
+        if not len(self.model):
+            return 'No rows'
+        return f'Rows {self.start + 1}-{self.stop()} of {len(self.model)}'
@@ -0,0 +1,232 @@
+import heapq
+import json
+import logging
+import os
+import subprocess
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+WORKERS = 2 # transfers running at the same time
+MAX_ATTEMPTS = 6 # a job is marked failed after that many attempts
+RETRY_DELAY = 30 # seconds before the first retry, doubled on each further retry
+MAX_RETRY_DELAY = 30 * 60
+SCP_TIMEOUT = 10 * 60 # seconds
+MAX_FINISHED = 100 # delivered or failed jobs kept for /transfers
+
+PENDING, RUNNING, DONE, FAILED = "pending", "running", "done", "failed"
+
+def retry_delay(attempts):
+    return min(RETRY_DELAY * 2 ** (attempts - 1), MAX_RETRY_DELAY)
+
+def scp(filepath, key_path, remote_path):
+    subprocess.run(['scp', '-i', key_path, filepath, remote_path], check=True, timeout=SCP_TIMEOUT)
+
+class TransferQueue:
+    # Delivers the saved files to the server in the background: each job is a
+    # file in its own directory of the spool, under the name it is delivered
+    # with, and a .json record of its state next to that directory, so the jobs
+    # left pending when the app stops are resumed on the next start. A job is
+    # copied with scp and then announced by email; a failed attempt is retried
+    # with an exponential backoff. Delivered files are removed from the spool,
+    # files that could not be delivered are kept there.
+    def __init__(self, spool, deliver, notify, workers=WORKERS):
+        self.spool = spool
+        self.deliver = deliver # deliver(filepath, key_path, remote_path)
+        self.notify = notify # notify(file_name, remote_path)
+        self.workers = workers
+        self.jobs = {} # job id -> record
+        self.finished = OrderedDict() # job id -> record of delivered and failed jobs
+        self.schedule = [] # heap of (time of the next attempt, job id)
+        self.condition = threading.Condition()
+        self.started = False
+
+    def start(self):
+        # Start the workers and resume the jobs found in the spool; the workers
+        # are started on first use so only the process serving requests runs them
+        with self.condition:
+            if self.started:
+                return
+            self.started = True
+            os.makedirs(self.spool, exist_ok=True)
+            for name in sorted(os.listdir(self.spool)):
+                if name.endswith('.json'):
+                    self.resume(os.path.join(self.spool, name))
+        for _ in range(self.workers):
+            threading.Thread(target=self.work, daemon=True).start()
+
+    def resume(self, record_path):
+        try:
+            with open(record_path, encoding='utf-8') as f:
+                job = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.error(f"Could not read the transfer job {record_path}: {e}")
+            return
+        if job['status'] in (DONE, FAILED):
+            self.finish(job)
+            return
+        legacy_path = os.path.join(self.spool, f"{job['id']}_{job['file_name']}")
+        if os.path.exists(legacy_path):
+            # Spooled before the jobs had their own directory
+            os.makedirs(self.job_directory(job), exist_ok=True)
+            os.replace(legacy_path, self.data_path(job))
+        job['status'] = PENDING
+        self.jobs[job['id']] = job
+        heapq.heappush(self.schedule, (job['next_attempt'], job['id']))
+
+    def new_job(self, file_name, key_path, remote_path):
+        return {'id': uuid.uuid4().hex, 'file_name': file_name, 'key_path': key_path, 'remote_path': remote_path,
+                'status': PENDING, 'attempts': 0, 'next_attempt': time.time(), 'error': '',
+                'created': time.time()}
+
+    def queue(self, job):
+        # Queue the transfer of a job whose file is written in the spool
+        self.save(job)
+        with self.condition:
+            self.jobs[job['id']] = job
+            heapq.heappush(self.schedule, (job['next_attempt'], job['id']))
+            self.condition.notify()
+        logging.info(f"File {job['file_name']} queued for transfer to {job['remote_path']}.")
+        return job['id']
+
+    def tee(self, file_name, chunks, key_path, remote_path):
+        # Write the file to the spool while its chunks (bytes) are sent to the
+        # client, and queue its transfer once it is complete. The spool file is
+        # opened here, so an unwritable spool is raised before the download
+        # starts.
+        self.start()
+        job = self.new_job(file_name, key_path, remote_path)
+        os.makedirs(self.job_directory(job))
+        try:
+            f = open(self.data_path(job), 'wb')
+        except OSError:
+            os.rmdir(self.job_directory(job))
+            raise
+        return self.spool_chunks(job, f, chunks)
+
+    def spool_chunks(self, job, f, chunks):
+        chunks = iter(chunks)
+        try:
+            with f:
+                try:
+                    for chunk in chunks:
+                        f.write(chunk)
+                        yield chunk
+                except GeneratorExit:
+                    # The client stopped reading, the file is still saved
+                    for chunk in chunks:
+                        f.write(chunk)
+        except Exception:
+            self.remove_data(job)
+            raise
+        self.queue(job)
+
+    def job_directory(self, job):
+        return os.path.join(self.spool, job['id'])
+
+    def data_path(self, job):
+        # Named as the file is saved, which scp keeps on the server
+        return os.path.join(self.job_directory(job), job['file_name'])
+
+    def remove_data(self, job):
+        os.remove(self.data_path(job))
+        os.rmdir(self.job_directory(job))
+
+    def record_path(self, job):
+        return os.path.join(self.spool, f"{job['id']}.json")
+
+    def save(self, job):
+        # Write the record atomically, a crash leaves the previous state
+        path = self.record_path(job)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(job, f)
+        os.replace(path + '.tmp', path)
+
+    def finish(self, job):
+        self.jobs.pop(job['id'], None)
+        self.finished[job['id']] = job
+        while len(self.finished) > MAX_FINISHED:
+            self.finished.popitem(last=False)
+
+    def next_job(self):
+        with self.condition:
+            while True:
+                if self.schedule:
+                    due, job_id = self.schedule[0]
+                    wait = due - time.time()
+                    if wait <= 0:
+                        heapq.heappop(self.schedule)
+                        job = self.jobs[job_id]
+                        job['status'] = RUNNING
+                        return job
+                    self.condition.wait(wait)
+                else:
+                    self.condition.wait()
+
+    def work(self):
+        while True:
+            job = self.next_job()
+            try:
+                self.run(job)
+            except Exception as e:
+                # A bad record or a failure to update the spool must not stop
+                # the worker, nor leave the job running forever
+                logging.error(f"Transfer of {job.get('file_name')} stopped: {e}")
+                self.abandon(job, e)
+
+    def run(self, job):
+        try:
+            self.deliver(self.data_path(job), job['key_path'], job['remote_path'])
+        except (subprocess.SubprocessError, OSError) as e:
+            self.retry(job, e)
+            return
+        logging.info(f"File {job['file_name']} successfully transferred to {job['remote_path']}")
+        try:
+            self.notify(job['file_name'], job['remote_path'])
+        except Exception as e:
+            logging.error(f"Could not send the notification for {job['file_name']}: {e}")
+        with self.condition:
+            job['status'] = DONE
+            job['attempts'] += 1
+            job['error'] = ''
+            self.finish(job)
+        self.remove_data(job)
+        os.remove(self.record_path(job))
+
+    def abandon(self, job, error):
+        # Mark the job failed when it was still running; it is kept in the spool
+        with self.condition:
+            if job.get('status') != RUNNING:
+                return
+            job['status'] = FAILED
+            job['error'] = str(error)
+            self.finish(job)
+        try:
+            self.save(job)
+        except Exception as e:
+            logging.error(f"Could not save the state of {job.get('file_name')}: {e}")
+
+    def retry(self, job, error):
+        logging.error(f"Transfer of {job['file_name']} failed: {error}")
+        with self.condition:
+            job['attempts'] += 1
+            job['error'] = str(error)
+            if job['attempts'] >= MAX_ATTEMPTS:
+                job['status'] = FAILED
+                self.finish(job)
+                logging.error(f"Giving up on {job['file_name']}, it is kept in {self.spool}")
+            else:
+                job['status'] = PENDING
+                job['next_attempt'] = time.time() + retry_delay(job['attempts'])
+                heapq.heappush(self.schedule, (job['next_attempt'], job['id']))
+                self.condition.notify()
+            self.save(job)
+
+    def status(self):
+        # The queued, running and recently finished jobs, oldest first
+        self.start()
+        with self.condition:
+            jobs = list(self.jobs.values()) + list(self.finished.values())
+            return sorted(({key: value for key, value in job.items() if key != 'key_path'} for job in jobs),
+                          key=lambda job: job['created'])
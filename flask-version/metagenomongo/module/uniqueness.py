@@ -0,0 +1,63 @@
+from collections import defaultdict
+
+# Columns identifying a sample. A sampleID may repeat (e.g. resequencing) only
+# with a distinct run_directory+barcode.
+KEY_FIELDS = ("sampleID", "run_directory", "barcode")
+
+class UniquenessIndex:
+    # Hash index of the sample keys: sampleID -> rows and
+    # sampleID+run_directory+barcode -> rows. A row can be any hashable id
+    # (a table position, a (file, position) pair, ...). Rows without a
+    # sampleID are not indexed. The keys with more than one row are tracked
+    # on every add/remove, so the conflicting groups are available directly.
+    def __init__(self):
+        self.keys = {} # row -> (sampleID, run_directory, barcode)
+        self.sampleIDs = defaultdict(set)
+        self.combinations = defaultdict(set)
+        self.duplicate_sampleIDs = set()
+        self.duplicate_combinations = set()
+
+    @classmethod
+    def from_columns(cls, sampleIDs, run_directories, barcodes, rows=None):
+        # Build the index in one pass over the three key columns
+        index = cls()
+        if rows is None:
+            rows = range(len(sampleIDs))
+        for row, sampleID, run_directory, barcode in zip(rows, sampleIDs, run_directories, barcodes):
+            index.add(row, sampleID, run_directory, barcode)
+        return index
+
+    def add(self, row, sampleID, run_directory, barcode):
+        if sampleID == "":
+            return
+        combination = (sampleID, run_directory, barcode)
+        self.keys[row] = combination
+        self.sampleIDs[sampleID].add(row)
+        if len(self.sampleIDs[sampleID]) > 1:
+            self.duplicate_sampleIDs.add(sampleID)
+        self.combinations[combination].add(row)
+        if len(self.combinations[combination]) > 1:
+            self.duplicate_combinations.add(combination)
+
+    def remove(self, row):
+        if row not in self.keys:
+            return
+        combination = self.keys.pop(row)
+        for key, rows, duplicates in ((combination[0], self.sampleIDs, self.duplicate_sampleIDs),
+                                      (combination, self.combinations, self.duplicate_combinations)):
+            rows[key].discard(row)
+            if len(rows[key]) < 2:
+                duplicates.discard(key)
+            if not rows[key]:
+                del rows[key]
+
+    def sampleID_conflicts(self):
+        # {sampleID: rows} for every sampleID used by more than one row
+        return {sampleID: self.sampleIDs[sampleID] for sampleID in self.duplicate_sampleIDs}
+
+    def combination_conflicts(self):
+        # {(sampleID, run_directory, barcode): rows} for every repeated combination
+        return {combination: self.combinations[combination] for combination in self.duplicate_combinations}
+
+    def is_duplicate_combination(self, row):
+        return self.keys.get(row) in self.duplicate_combinations
@@ -1,12 +1,14 @@
-import re
-from collections import Counter
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 
-DATE_FIELDS = ["collection_date", "run_date"]
-MANDATORY_COLUMNS = ("projectID", "project_directory", "sampleID")
-COLUMNS_WITH_DISALLOWED_SPECIAL_CHARACTERS = ("projectID", "project_directory", "sampleID", "run_directory")
+import numpy as np
+import pandas as pd
 
-DATE_PATTERN = re.compile(r'^\d{4}(-\d{2}(-\d{2}(T\d{2}:\d{2}:\d{2}\.\d{3}Z)?)?)?$')
-SPECIAL_CHAR_PATTERN = re.compile(r'[^a-zA-Z0-9-_]')
+import module.rules as rules
+import module.uniqueness as uniqueness
+
+KEY_FIELDS = uniqueness.KEY_FIELDS
+PARALLEL_MIN_ROWS = 50000 # smaller tables are validated serially, starting the processes costs more
 
 def data_assign(fields, values):
     # Retrieve input values
@@ -18,102 +20,175 @@ def data_assign(fields, values):
     result["data"][0].pop() # Delete
     return result
 
-def create_data_type_set(data_type, fields, options):
-    return {field for field in fields if data_type == options[field]['datatype']}
+def string_mask(column):
+    # Only string cells are corrected and validated
+    if pd.api.types.infer_dtype(column, skipna=False) == "string":
+        return np.ones(len(column), dtype=bool)
+    return np.fromiter((isinstance(x, str) for x in column), dtype=bool, count=len(column))
+
+def per_value(cells, func):
+    # Submission columns are highly repetitive: run func once per distinct
+    # value and broadcast the result back with the factorized codes
+    codes, uniques = pd.factorize(cells)
+    return np.asarray(func(pd.Series(uniques, dtype=object)))[codes]
+
+def correct_column(rule, column):
+    # Apply the corrections to every non-empty string cell of the column at once
+    target = string_mask(column) & (column != "").to_numpy()
+    if not target.any():
+        return column
+    column = column.copy()
+    column[target] = per_value(column[target], rule.normalize)
+    return column
+
+def cell_mask(column, mask, test):
+    # Evaluate a vectorized test on the selected cells only; others are False
+    if test is None:
+        return mask
+    result = np.zeros(len(column), dtype=bool)
+    if mask.any():
+        result[mask] = per_value(column[mask], test).astype(bool)
+    return result
+
+def validate_column(rule, column):
+    # Return a list of (check, failing row mask, message) for the column
+    active = string_mask(column)
+    empty = active & (column == "").to_numpy()
+    if rule.allow_empty:
+        active = active & ~empty
+    scopes = {rules.ALL_CELLS: active, rules.FILLED_CELLS: active & ~empty, rules.EMPTY_CELLS: active & empty}
+    return [(check.order, cell_mask(column, scopes[check.scope], check.test), check.message)
+            for check in rule.checks]
+
+def collect_errors(fields, failures):
+    # Merge the per-column failure masks into the row-major error list
+    rows, cols, checks, message_ids = [], [], [], []
+    messages = []
+    for col_index, check, mask, message in failures:
+        positions = np.flatnonzero(mask)
+        if positions.size == 0:
+            continue
+        rows.append(positions)
+        cols.append(np.full(positions.size, col_index))
+        checks.append(np.full(positions.size, check))
+        message_ids.append(np.full(positions.size, len(messages)))
+        messages.append((fields[col_index], message))
+    if not rows:
+        return []
+    rows, cols, checks, message_ids = (np.concatenate(a) for a in (rows, cols, checks, message_ids))
+    order = np.lexsort((checks, cols, rows))
+    return [[int(rows[i]), *messages[message_ids[i]]] for i in order]
+
+def validate_rows(fields, column_rules, df):
+    # Correct and validate the rows of df (without fully empty rows) one whole
+    # column at a time. Returns the row-major error list and the corrected
+    # key columns used by the cross-row checks.
+    failures = []
+    keys = pd.DataFrame({field: "" for field in KEY_FIELDS}, index=range(len(df)))
+    for rule in column_rules:
+        column = correct_column(rule, df.iloc[:, rule.index].reset_index(drop=True))
+        if rule.field in KEY_FIELDS:
+            keys[rule.field] = column
+        for check, mask, message in validate_column(rule, column):
+            failures.append((rule.index, check, mask, message))
+    return collect_errors(fields, failures), keys
+
+def validate_entry(column_rules, entry):
+    # [(field, message)] of the filled cells of a single row (an entry typed
+    # in the GUIs), checked with the rules of the table
+    failures = []
+    for rule in column_rules:
+        value = entry[rule.index]
+        if not isinstance(value, str) or value == "":
+            continue
+        cells = pd.Series([value], dtype=object)
+        failures.extend((rule.field, check.message) for check in rule.checks
+                        if check.scope != rules.EMPTY_CELLS and check.test is not None and check.test(cells)[0])
+    return failures
+
+def build_uniqueness_index(keys):
+    return uniqueness.UniquenessIndex.from_columns(*(keys[field] for field in KEY_FIELDS))
+
+def duplicate_errors(index, position=None):
+    # Rows sharing a sampleID need a run_directory and a barcode, and the
+    # sampleID+run_directory+barcode combination must be unique. position maps
+    # the row ids of the index to table rows when they are not positions.
+    error_list = []
+    rows = [row for rows in index.sampleID_conflicts().values() for row in rows]
+    for row_index, row in sorted((row if position is None else position(row), row) for row in rows):
+        _, run_directory, barcode = index.keys[row]
+        if run_directory == "":
+            error_list.append([row_index, "run_directory", "run_directory is necessary"])
+        if barcode == "":
+            error_list.append([row_index, "barcode", "Barcode is necessary"])
+        if index.is_duplicate_combination(row):
+            error_list.append([row_index, "sampleID", "Each combination of sampleID+rundirectory+barcode must be unique"])
+    return error_list
+
+def has_id(df):
+    # Rows with an _id update a record of the database
+    if "_id" not in df.columns:
+        return np.zeros(len(df), dtype=bool)
+    return (df["_id"] != "").to_numpy()
+
+# Set in each worker process of validate_rows_parallel
+worker = {}
+
+def init_worker(fields, options, df):
+    # The rules hold local functions, so each worker compiles its own from the
+    # options rather than receiving them pickled
+    worker['fields'] = fields
+    worker['column_rules'] = rules.compile_rules(fields, options)
+    worker['df'] = df
+
+def validate_shard(start, stop, shard=None):
+    if shard is None:
+        shard = worker['df'].iloc[start:stop]
+    cell_errors, keys = validate_rows(worker['fields'], worker['column_rules'], shard)
+    return [[row_index + start, field, message] for row_index, field, message in cell_errors], keys
+
+def validate_rows_parallel(fields, options, df, workers):
+    # validate_rows on contiguous row shards in worker processes. With the
+    # fork start method the workers share the table with this process (copy
+    # on write) and only the shard bounds are sent; elsewhere each shard is
+    # pickled. Shards are contiguous and their errors row-major, so
+    # concatenating them in order gives the serial result.
+    bounds = np.linspace(0, len(df), workers + 1, dtype=int)
+    shards = [(int(start), int(stop)) for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+    fork = 'fork' in multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('fork' if fork else None)
+    with ProcessPoolExecutor(max_workers=len(shards), mp_context=context, initializer=init_worker,
+                             initargs=(fields, options, df if fork else None)) as executor:
+        futures = [executor.submit(validate_shard, start, stop, None if fork else df.iloc[start:stop])
+                   for start, stop in shards]
+        results = [future.result() for future in futures]
+    cell_errors = [error for shard_errors, _ in results for error in shard_errors]
+    keys = pd.concat([shard_keys for _, shard_keys in results], ignore_index=True) if results \
+        else pd.DataFrame({field: [] for field in KEY_FIELDS})
+    return cell_errors, keys
 
-def validation_all(fields, options, errors, df_temp):
+def validation_all(fields, options, errors, df_temp, column_rules=None, reference=None, workers=None):
+    # column_rules is compiled from .metagenomongo.csv once at startup; it is
+    # only compiled here for callers that do not keep one around. reference,
+    # when given, is the module.reference index of the samples already in the
+    # master dataset. workers > 1 validates the rows of a large table in that
+    # many processes; the cross-row checks run on the merged result, so the
+    # errors are the same as serially. Only use it from scripts: forking a
+    # threaded process such as the web app is not safe.
+    if column_rules is None:
+        column_rules = rules.compile_rules(fields, options)
     # Remove fully empty rows
     df_temp = df_temp[~(df_temp == '').all(axis=1)]
-    corrected_count = 0
-    corrected_items = []
-    error_list =[]
-    data = df_temp.values.tolist()
-    int_dynamic_type = create_data_type_set("int", fields, options)
-    float_dynamic_type = create_data_type_set("float", fields, options)
-    sampleID_rundirectory_barcode_list = []
-    sampleID_list = []
-    # Apply corrections to data
-    for row_index, row in enumerate(data):
-        for col_index, cell in enumerate(row):
-            if isinstance(cell, str):  # Process only strings
-                original_cell = cell
-                cell = re.sub(r'\s+', ' ', cell)
-                cell = cell.strip(',; ')
-                cell = re.sub(r',\s*(\S)', r'; \1', cell)
-                # Apply specific column corrections
-                if fields[col_index] == "locality":
-                    cell = re.sub(r':(?!\s)', ': ', cell)
-                elif fields[col_index] == "source_type":
-                    cell = cell.capitalize()
-                elif fields[col_index] == "if_repeated":
-                    cell = "y" if cell.lower() == "yes" else "n" if cell.lower() == "no" else cell
-                if cell != original_cell:
-                    data[row_index][col_index] = cell
-                    corrected_count += 1
-                    corrected_items.append(f'Row {row_index + 1}, Column {col_index + 1}: {original_cell} -> {cell}')
-    # Validate data
-    if data == []:
+    error_list = []
+    if df_temp.empty:
         error_list.append([0, "", "Empty data."])
-    for row_index, row in enumerate(data):
-        sampleID, run_directory, barcode = "", "", ""
-        for col_index, cell in enumerate(row):
-            field = fields[col_index]
-            if isinstance(cell, str):
-                if field in DATE_FIELDS:
-                    if field == "run_date" and cell == "":
-                        continue
-                    elif not DATE_PATTERN.match(cell):
-                        error_list.append([row_index, field, "Invalid value. Expected data type: date"])
-                if (field in options and options[field]['combobox_type'] == 'fix' and options[field]['options']
-                    and cell not in options[field]['options']):
-                    error_list.append([row_index, field, f"Invalid value. Possible values are: '{options[field]['options']}'"])
-                if (field in int_dynamic_type
-                    and cell != ""
-                    and not cell.isdigit()):
-                            error_list.append([row_index, field, "Invalid value. Expected data type: int"])
-                elif (field in float_dynamic_type
-                      and cell != ""):
-                    try:
-                        float(cell)
-                    except ValueError:
-                        error_list.append([row_index, field, "Invalid value. Expected data type: float"])
-                if field == "run_directory" and sampleID != "":
-                    run_directory = cell
-                elif field == "barcode" and sampleID != "":
-                    barcode = cell
-                elif field in MANDATORY_COLUMNS and cell == "":
-                    error_list.append([row_index, field, f"{field} is necessary"])
-                elif (field in COLUMNS_WITH_DISALLOWED_SPECIAL_CHARACTERS
-                      and SPECIAL_CHAR_PATTERN.search(cell)):
-                    error_list.append([row_index, field, f"{field}\
-                        Only alphanumeric characters, hyphens, and underscores are allowed."])
-                if field == "sampleID" and cell != "":
-                    sampleID_list.append(sampleID)
-                    
-        if sampleID != "":
-            data_id = f"{sampleID}{run_directory}{barcode}"
-            sampleID_rundirectory_barcode_list.append(data_id)
-    sampleIDs = Counter(sampleID_list)
-    sampleID_rundirectory_barcode_ids = Counter(sampleID_rundirectory_barcode_list)
-    duplicate_sampleIDs = {id for id, count in sampleIDs.items() if int(count) > 1}
-    duplicate_sampleID_rundirectory_barcodes = \
-        {id for id, count in sampleID_rundirectory_barcode_ids.items() if int(count) > 1}
-    if duplicate_sampleIDs != {}:
-        for row_index, row in enumerate(data):
-            sampleID, run_directory, barcode = "", "", ""
-            for col_index, cell in enumerate(row):
-                field = fields[col_index]
-                if cell in duplicate_sampleIDs:
-                    sampleID = cell
-                if sampleID != "":
-                    if field == "run_directory":
-                        if cell == "":
-                            error_list.append([row_index, field, "run_directory is necessary"])
-                        run_directory = cell
-                    if field == "barcode":
-                        if cell == "":
-                            error_list.append([row_index, field, "Barcode is necessary"])
-                        barcode = cell
-            if f"{sampleID}{run_directory}{barcode}" in duplicate_sampleID_rundirectory_barcodes:
-                error_list.append([row_index, field, "Each combination of sampleID+rundirectory+barcode must be unique"])
-    errors['fatal_error'] = error_list
\ No newline at end of file
+    # Apply corrections and validate data, one whole column at a time
+    if workers and workers > 1 and len(df_temp) >= PARALLEL_MIN_ROWS:
+        cell_errors, keys = validate_rows_parallel(fields, options, df_temp, workers)
+    else:
+        cell_errors, keys = validate_rows(fields, column_rules, df_temp)
+    error_list.extend(cell_errors)
+    error_list.extend(duplicate_errors(build_uniqueness_index(keys)))
+    if reference is not None:
+        error_list.extend(reference.collisions(keys.itertuples(index=False, name=None), has_id(df_temp)))
+    errors['fatal_error'] = error_list
@@ -58,7 +58,246 @@ function addScrollToErrorMessages(){
   });
 }
 
+// Post the table as one JSON object of columns ({field: [values]}) instead
+// of one form field per cell
+function postTableAsColumns(form) {
+  const wrap = form.querySelector(".table-wrap");
+  const fields = Array.from(wrap.querySelectorAll("thead th"), (th) => th.textContent.trim());
+  const columns = Object.fromEntries(fields.map((field) => [field, []]));
+  wrap.querySelectorAll("tbody tr").forEach((tr) => {
+    const values = new Array(fields.length).fill("");
+    tr.querySelectorAll("input[name]").forEach((input) => {
+      values[parseInt(input.name.split("_")[1], 10)] = input.value;
+    });
+    fields.forEach((field, col) => columns[field].push(values[col]));
+  });
+  let table = form.querySelector('input[name="table"]');
+  if (!table) {
+    table = document.createElement("input");
+    table.type = "hidden";
+    table.name = "table";
+    form.appendChild(table);
+  }
+  table.value = JSON.stringify(columns);
+  // Disabled inputs are not submitted
+  wrap.querySelectorAll("input[name]").forEach((input) => (input.disabled = true));
+}
+
+// Tables too large to render in one page are kept on the server: only the
+// rows in view are fetched from /rows and rendered between two spacer rows,
+// and every edit is sent back to the server copy of the table.
+const ROW_OVERSCAN = 10;
+
+function paginatedTable(wrap) {
+  const tableId = wrap.dataset.tableId;
+  const pageSize = parseInt(wrap.dataset.pageSize, 10);
+  const columns = wrap.querySelectorAll("thead th").length;
+  const tbody = wrap.querySelector("tbody");
+  const pages = new Map(); // page number -> rows, or the pending request
+  let total = parseInt(wrap.dataset.total, 10);
+  let rowHeight = 0;
+  let edits = Promise.resolve();
+  const undoButton = document.getElementById("undo");
+  const redoButton = document.getElementById("redo");
+
+  function spacer(height) {
+    const tr = document.createElement("tr");
+    const td = document.createElement("td");
+    td.colSpan = columns;
+    td.style.padding = "0";
+    td.style.border = "none";
+    td.style.height = height + "px";
+    tr.appendChild(td);
+    return tr;
+  }
+
+  function loadPage(page) {
+    if (pages.has(page)) {
+      return;
+    }
+    const url = `/rows?table_id=${tableId}&start=${page * pageSize}&count=${pageSize}`;
+    pages.set(
+      page,
+      fetch(url)
+        .then((response) => response.json())
+        .then((result) => {
+          pages.set(page, result.rows);
+          render();
+        })
+        .catch(() => pages.delete(page))
+    );
+  }
+
+  function showError(message) {
+    const div = document.createElement("div");
+    div.className = "error-message";
+    div.textContent = message;
+    document.querySelector(".result").prepend(div);
+  }
+
+  // Resolves to the number of rows, or null when the request failed; a
+  // failed request is reported and the next ones are still sent
+  function post(payload) {
+    payload.table_id = tableId;
+    edits = edits
+      .then(() =>
+        fetch("/rows", {
+          method: "POST",
+          headers: { "Content-Type": "application/json" },
+          body: JSON.stringify(payload),
+        })
+      )
+      .then((response) =>
+        response
+          .json()
+          .catch(() => ({}))
+          .then((result) => {
+            if (!response.ok) {
+              throw new Error(result.error || `The change could not be saved (${response.status}).`);
+            }
+            // the edits kept by the server that can be undone or redone
+            undoButton.disabled = !result.undo;
+            redoButton.disabled = !result.redo;
+            return result.total;
+          })
+      )
+      .catch((error) => {
+        showError(error.message);
+        return null;
+      });
+    return edits;
+  }
+
+  function reload() {
+    post({}).then((newTotal) => {
+      if (newTotal === null) {
+        return;
+      }
+      total = newTotal;
+      pages.clear();
+      render();
+    });
+  }
+
+  function postAndReload(payload) {
+    post(payload).then((newTotal) => {
+      if (newTotal !== null) {
+        reload();
+      }
+    });
+  }
+
+  function input(type, value) {
+    const elm = document.createElement("input");
+    elm.type = type;
+    elm.value = value;
+    return elm;
+  }
+
+  function renderRow(row, values) {
+    const tr = document.createElement("tr");
+    tr.id = row;
+    for (let col = 0; col < columns; col++) {
+      const td = document.createElement("td");
+      const value = values ? values[col] : "";
+      if (col === 0 || col === 3) {
+        const div = document.createElement("div");
+        div.textContent = value;
+        td.appendChild(div);
+      } else if (col === 1) {
+        const button = input("button", "Dupl");
+        if (values && values[3]) {
+          // if _id exists, disable Duplicate function
+          button.classList.add("disabled");
+        } else {
+          button.addEventListener("click", () => postAndReload({ duplicate: [row] }));
+        }
+        td.appendChild(button);
+      } else if (col === 2) {
+        const button = input("button", "X");
+        button.addEventListener("click", () => postAndReload({ delete: [row] }));
+        td.appendChild(button);
+      } else {
+        const text = input("text", value);
+        if (values) {
+          // keep the typed value in the cache, so re-rendering on scroll keeps it
+          text.addEventListener("input", () => (values[col] = text.value));
+          text.addEventListener("change", () => post({ edits: [[row, col, text.value]] }));
+        } else {
+          text.disabled = true;
+        }
+        td.appendChild(text);
+      }
+      tr.appendChild(td);
+    }
+    return tr;
+  }
+
+  function render() {
+    const height = rowHeight || 40;
+    const visible = Math.ceil(wrap.clientHeight / height);
+    const first = Math.max(Math.floor(wrap.scrollTop / height) - ROW_OVERSCAN, 0);
+    const last = Math.min(first + visible + 2 * ROW_OVERSCAN, total);
+    const rows = [spacer(first * height)];
+    for (let row = first; row < last; row++) {
+      const page = Math.floor(row / pageSize);
+      const cached = pages.get(page);
+      if (Array.isArray(cached)) {
+        rows.push(renderRow(row, cached[row - page * pageSize]));
+      } else {
+        loadPage(page);
+        rows.push(renderRow(row, null));
+      }
+    }
+    rows.push(spacer((total - last) * height));
+    tbody.replaceChildren(...rows);
+    if (!rowHeight && last > first) {
+      rowHeight = rows[1].getBoundingClientRect().height;
+      render();
+    }
+  }
+
+  wrap.addEventListener("scroll", render);
+  undoButton.addEventListener("click", () => postAndReload({ undo: true }));
+  redoButton.addEventListener("click", () => postAndReload({ redo: true }));
+  // Send the pending edits before the form is submitted
+  wrap.closest("form").addEventListener("submit", function (event) {
+    event.preventDefault();
+    const form = this;
+    if (event.submitter && event.submitter.formAction) {
+      form.action = event.submitter.formAction;
+    }
+    edits.finally(() => form.submit());
+  });
+  render();
+  return {
+    scrollToRow(row) {
+      wrap.scrollTop = row * (rowHeight || 40) - wrap.clientHeight / 2;
+    },
+  };
+}
+
+function addScrollToPaginatedErrorMessages(table) {
+  document.querySelectorAll(".error-message").forEach(function (message) {
+    message.addEventListener("click", function () {
+      table.scrollToRow(parseInt(this.getAttribute("data-row"), 10));
+    });
+  });
+}
+
 window.addEventListener("load", function () {
+  const wrap = document.querySelector(".table-wrap");
+  if (wrap.dataset.total) {
+    addScrollToPaginatedErrorMessages(paginatedTable(wrap));
+    return;
+  }
+  wrap.closest("form").addEventListener("submit", function () {
+    postTableAsColumns(this);
+  });
+  // Enable the inputs again when the page is restored with the back button
+  window.addEventListener("pageshow", function () {
+    wrap.querySelectorAll("input[name]").forEach((input) => (input.disabled = false));
+  });
   setupButton('input[name$="_2"]', "button", "X", "red", "deleteRow(this)");
   const id = document.querySelector('input[name$="_3"]');
   if (id.value) {
@@ -0,0 +1,15 @@
+import pandas as pd
+
+import module.export as export
+
+def test_full_dates_become_timestamps():
+    column = export.typed_column(pd.Series(['2023-05-17', '', '2024-01-02T10:11:12.000Z'], dtype=object), 'date')
+    assert str(column.dtype) == 'datetime64[ns, UTC]'
+    assert column[0] == pd.Timestamp('2023-05-17', tz='UTC')
+    assert pd.isna(column[1])
+
+def test_partial_dates_are_kept_as_entered():
+    # A year or a month alone is not turned into its first day
+    values = ['2023', '2023-05', '2023-05-17', '']
+    column = export.typed_column(pd.Series(values, dtype=object), 'date')
+    assert column.tolist() == values
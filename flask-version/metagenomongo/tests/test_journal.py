@@ -0,0 +1,109 @@
+import os
+
+import pandas as pd
+import pytest
+
+import module.correction as correction
+import module.journal as journal
+import module.schema as schema
+import module.table_model as table_model
+
+SCHEMA = schema.SchemaCache(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.metagenomongo.csv')).get()
+SPECIES = SCHEMA.field_index['species']
+
+def sample_rows():
+    # Two rows the correction changes and an empty row it removes
+    rows = [[''] * len(SCHEMA.fields) for _ in range(3)]
+    rows[0][SPECIES] = ' E. coli ,, sp. '
+    rows[2][SPECIES] = 'B.  subtilis'
+    return rows
+
+class ModelEdits:
+    # The edits of mtgnmng.py on its TableModel
+    def __init__(self):
+        self.table = table_model.TableModel(SCHEMA.fields)
+        self.journal = journal.Journal()
+
+    def rows(self):
+        return self.table.rows(0, len(self.table))
+
+    def import_rows(self, rows):
+        old_state = self.table.state()
+        self.table.load_frame(pd.DataFrame(rows, columns=SCHEMA.fields, dtype=object))
+        return [journal.TableReplace(old_state, self.table.state())]
+
+    def frame(self):
+        return self.table.to_frame()
+
+class ListEdits:
+    # The edits of metagenomongo.py on its list of rows
+    def __init__(self):
+        self.data = []
+        self.table = journal.RowsTable(self.data)
+        self.journal = journal.Journal()
+
+    def rows(self):
+        return [list(row) for row in self.data]
+
+    def import_rows(self, rows):
+        old_state = self.table.state()
+        self.data.clear()
+        self.data.extend(rows)
+        return [journal.TableReplace(old_state, self.table.state())]
+
+    def frame(self):
+        return self.data
+
+def run(edits, action):
+    # Perform one action as the GUIs do
+    kind, *args = action
+    if kind == 'import':
+        edits.journal.record('Import', edits.import_rows(*args))
+    elif kind == 'add':
+        edits.journal.perform('Add', [journal.RowInsert(len(edits.rows()), args[0])], edits.table)
+    elif kind == 'update':
+        row, col, value = args
+        edits.journal.perform('Update', [journal.cell_changes([row], [col], [edits.rows()[row][col]], [value])], edits.table)
+    elif kind == 'correct':
+        _, changes, _ = correction.correct_and_validate(SCHEMA.fields, SCHEMA.options, SCHEMA.column_rules, edits.frame())
+        edits.journal.perform('Correction', changes, edits.table)
+
+def perform_all(edits, actions):
+    # The rows before and after each action
+    history = [edits.rows()]
+    for action in actions:
+        run(edits, action)
+        history.append(edits.rows())
+    return history
+
+@pytest.mark.parametrize('edits_class', [ModelEdits, ListEdits])
+@pytest.mark.parametrize('actions', [
+    [('import', sample_rows()), ('add', ['x'] * len(SCHEMA.fields)), ('correct',)],
+    [('import', sample_rows()), ('update', 0, SPECIES, 'changed ,, value'), ('correct',)],
+])
+def test_undo_redo_across_import_and_correction(edits_class, actions):
+    edits = edits_class()
+    history = perform_all(edits, actions)
+    assert history[-1] != history[-2] # the correction changed the table
+    # Undo back to the empty table, then redo step by step, twice over
+    for _ in range(2):
+        for expected in reversed(history[:-1]):
+            assert edits.journal.undo(edits.table) is not None
+            assert edits.rows() == expected
+        assert edits.journal.undo(edits.table) is None
+        for expected in history[1:]:
+            assert edits.journal.redo(edits.table) is not None
+            assert edits.rows() == expected
+        assert edits.journal.redo(edits.table) is None
+
+def test_partial_undo_then_redo():
+    # Import, Add row, Correct, Undo x3, Redo x2: the added row comes back once
+    edits = ModelEdits()
+    added = ['x'] * len(SCHEMA.fields)
+    history = perform_all(edits, [('import', sample_rows()), ('add', added), ('correct',)])
+    for _ in range(3):
+        edits.journal.undo(edits.table)
+    edits.journal.redo(edits.table)
+    edits.journal.redo(edits.table)
+    assert edits.rows() == history[2]
+    assert edits.rows().count(added) == 1
@@ -0,0 +1,44 @@
+import random
+
+import pytest
+
+import module.rules as rules
+
+# Values built from the characters the normalizers act on
+PIECES = [' ', '  ', '\t', '\n', '\xa0', ',', ';', ':', ', ', ' ,', 'a', 'B', 'é', 'yes', 'No', 'HU', '1']
+EXAMPLES = 20000
+
+def random_values(seed, count):
+    generator = random.Random(seed)
+    return [''.join(generator.choice(PIECES) for _ in range(generator.randint(0, 8))) for _ in range(count)]
+
+def column_normalize(name):
+    return rules.compose(rules.COMMON_NORMALIZERS + ((rules.NORMALIZERS[name],) if name else ()))
+
+@pytest.mark.parametrize('name', [None, *rules.NORMALIZERS])
+def test_one_pass_reaches_the_fixed_point(name):
+    # normalize(normalize(x)) == normalize(x), so the correction needs no
+    # second pass over the table
+    normalize = column_normalize(name)
+    values = random_values(name, EXAMPLES)
+    once = normalize(values)
+    twice = normalize(once)
+    for value, first, second in zip(values, once, twice):
+        assert first == second, f"{value!r} -> {first!r} -> {second!r}"
+
+@pytest.mark.parametrize('value, expected', [
+    ('a,b', 'a; b'),
+    ('a, b', 'a; b'),
+    # Repeated separators become a single one: the former correction loop
+    # gave 'a; ; b' for these
+    ('a,,b', 'a; b'),
+    ('a, ,b', 'a; b'),
+    ('a,, , b', 'a; b'),
+    (',a,;', 'a'),
+    ('  a \t b ', 'a b'),
+])
+def test_separators(value, expected):
+    assert column_normalize(None)([value])[0] == expected
+
+def test_colon_space_after_separators():
+    assert column_normalize('colon_space')(['loc:a,,b'])[0] == 'loc: a; b'
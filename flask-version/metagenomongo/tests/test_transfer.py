@@ -0,0 +1,29 @@
+import os
+import threading
+
+import pytest
+
+import module.transfer as transfer
+
+def test_file_is_delivered_under_its_name(tmp_path):
+    # The server gets the file under the name the notification announces
+    delivered = threading.Event()
+    names = []
+    def deliver(filepath, key_path, remote_path):
+        names.append(os.path.basename(filepath))
+    def notify(file_name, remote_path):
+        names.append(file_name)
+        delivered.set()
+    queue = transfer.TransferQueue(str(tmp_path), deliver, notify, workers=1)
+    assert b''.join(queue.tee('user_2024-01-01-00-00-00.csv', [b'a,b\n', b'1,2\n'], 'key', 'host:dir')) == b'a,b\n1,2\n'
+    assert delivered.wait(5)
+    assert names == ['user_2024-01-01-00-00-00.csv', 'user_2024-01-01-00-00-00.csv']
+
+def test_failed_download_leaves_nothing_in_the_spool(tmp_path):
+    def chunks():
+        yield b'a'
+        raise ValueError('encoding failed')
+    queue = transfer.TransferQueue(str(tmp_path), None, None, workers=0)
+    with pytest.raises(ValueError):
+        list(queue.tee('user.csv', chunks(), 'key', 'host:dir'))
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,101 @@
+# Validate a batch of .csv/.xlsx sheets without the GUI or the web app.
+# One JSON object is printed per file as soon as it is validated:
+#   {"file": ..., "rows": ..., "fatal_error": [[row, field, message], ...], "warning": [...]}
+# The exit status is 1 when any file has a fatal error. A single file is
+# validated in row shards over the worker processes instead.
+# Run: python flask-version/metagenomongo/validate.py [-j WORKERS] FILE_OR_DIRECTORY...
+import argparse
+import json
+import os
+import sys
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import module.schema as schema
+import module.aliases as aliases
+import module.reference as reference
+import module.stream_import as stream_import
+import module.validation as data_validation
+
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.metagenomongo.csv')
+EXTENSIONS = ('.csv', '.xlsx')
+
+# Set in each worker process by init_worker
+worker = {}
+
+def init_worker(schema_file, reference_file):
+    worker['schema'] = schema.SchemaCache(schema_file).get()
+    worker['aliases'] = aliases.AliasStore(aliases.alias_file(schema_file))
+    worker['reference'] = reference.FileReference(reference_file) if reference_file else None
+
+def validate_file(filepath, shards=None):
+    # shards > 1 validates the rows of the file in that many processes
+    current = worker['schema']
+    errors = defaultdict(list)
+    imported_fields = stream_import.read_header(filepath)
+    header_mapping = worker['aliases'].lookup(imported_fields, current.fields)
+    incorrect_fields = [header for header in imported_fields
+                        if header not in current.fields and header not in header_mapping]
+    if incorrect_fields:
+        errors['fatal_error'].append([0, "", "Input file contains unexpected fields :::" + ",".join(incorrect_fields)])
+        return {'file': filepath, 'rows': 0, 'fatal_error': errors['fatal_error'], 'warning': errors['warning']}
+    if shards and shards > 1:
+        chunks = [stream_import.prepare_chunk(chunk, current.fields, header_mapping)
+                  for chunk in stream_import.read_chunks(filepath)]
+        data = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=current.fields)
+        data_validation.validation_all(current.fields, current.options, errors, data, current.column_rules,
+                                       worker['reference'], workers=shards)
+        rows = len(data)
+    else:
+        rows = 0
+        for chunk in stream_import.validate_chunks(stream_import.read_chunks(filepath), current.fields, current.column_rules,
+                                                   errors, worker['reference'], header_mapping):
+            rows += len(chunk)
+    return {'file': filepath, 'rows': rows, 'fatal_error': errors['fatal_error'], 'warning': errors['warning']}
+
+def find_files(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, _, names in os.walk(path):
+                for name in sorted(names):
+                    if name.lower().endswith(EXTENSIONS):
+                        yield os.path.join(directory, name)
+        else:
+            yield path
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validate .csv/.xlsx sheets and print one JSON line per file.")
+    parser.add_argument('paths', nargs='+', help="files, or directories searched for .csv/.xlsx files")
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count(), help="processes (default: one per CPU)")
+    parser.add_argument('--schema', default=SCHEMA_FILE, help="the .metagenomongo.csv to validate against")
+    parser.add_argument('--reference', help="csv export of the master dataset to check the samples against")
+    args = parser.parse_args(argv)
+
+    filepaths = list(find_files(args.paths))
+    if len(filepaths) == 1:
+        init_worker(args.schema, args.reference)
+        try:
+            report = validate_file(filepaths[0], args.workers)
+        except Exception as e:
+            report = {'file': filepaths[0], 'rows': 0, 'fatal_error': [[0, "", f"Could not be read: {e}"]], 'warning': []}
+        print(json.dumps(report), flush=True)
+        return 1 if report['fatal_error'] else 0
+
+    failed = False
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker,
+                             initargs=(args.schema, args.reference)) as executor:
+        futures = {executor.submit(validate_file, filepath): filepath for filepath in filepaths}
+        for future in as_completed(futures):
+            try:
+                report = future.result()
+            except Exception as e:
+                report = {'file': futures[future], 'rows': 0, 'fatal_error': [[0, "", f"Could not be read: {e}"]], 'warning': []}
+            failed = failed or bool(report['fatal_error'])
+            print(json.dumps(report), flush=True)
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
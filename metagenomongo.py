@@ -1,37 +1,19 @@
 import os
+import sys
 import csv
-import difflib
-import openpyxl
-import re
+import itertools
+import pandas as pd
 import PySimpleGUI as sg
 
-# Function to read headers from a CSV file
-def load_headers(filename):
-    if not os.path.exists(filename):
-        sg.popup_error(f"File {filename} not found!")
-        return []
-    with open(filename, 'r') as file:
-        reader = csv.reader(file)
-        headers = [row[0] for row in reader if not row[0].startswith("#")]
-    return headers[1:]  # Skip the first non-header line
-
-# Function to load options from the CSV file
-def load_options(filename):
-    if not os.path.exists(filename):
-        sg.popup_error(f"File {filename} not found!")
-        return {}
-    with open(filename, 'r') as file:
-        reader = csv.reader(file)
-        next(reader)  # Skip the first row
-        options = {}
-        for row in reader:
-            header = row[0]
-            options[header] = {
-                'type': row[1],
-                'options': row[2].split(',') if row[2] else [],
-                'combobox_type': row[3] if len(row) > 3 else ''
-            }
-    return options
+# The schema, import, correction and validation are shared with the web version
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'flask-version', 'metagenomongo'))
+import module.schema as schema
+import module.headers as header_resolution
+import module.stream_import as stream_import
+import module.correction as correction
+import module.validation as data_validation
+import module.export as export
+import module.journal as journal
 
 # Get the directory of the script
 script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -39,19 +21,23 @@ script_dir = os.path.dirname(os.path.abspath(__file__))
 # Construct the path to headers.csv
 headers_file = os.path.join(script_dir, '.metagenomongo.csv')
 
-# Load headers from the CSV file
-headers = load_headers(headers_file)
-
-# Load options from the CSV file
-options = load_options(headers_file)
+# Load the headers, their options and rules from the CSV file
+SCHEMA = schema.SchemaCache(headers_file)
+headers = SCHEMA.get().fields
+options = SCHEMA.get().options
+column_rules = SCHEMA.get().column_rules
 
 # Check if headers were successfully loaded
 if not headers:
     sg.popup_error("Headers could not be loaded. Please check the .metagenomongo.csv file.")
     exit(1)
 
+
 # Initialize an empty data list and empty selected row list
 data = []
+# The edits of data, undone and redone from their changes only
+rows = journal.RowsTable(data)
+JOURNAL = journal.Journal()
 
 # Generate the layout
 sg.theme('Default1')
@@ -68,14 +54,16 @@ layout = [
              sg.Button('Import File', pad=(0, 10), key='-IMPORT-'),
              sg.Button('Save as CSV', pad=(10, 10), key='-SAVE-'),
              sg.Button('Clear', pad=(0, 10), key='-CLEAR-'),
-             sg.Button('Generate template', pad=(10, 10), key='-TEMPLATE-')]
+             sg.Button('Generate template', pad=(10, 10), key='-TEMPLATE-'),
+             sg.Button('Undo', pad=(0, 10), key='-UNDO-'),
+             sg.Button('Redo', pad=(10, 10), key='-REDO-')]
         ])
     ],
     [
         sg.Column([
             [sg.Text(f'{header}:', size=(15, 1), font=('Helvetica', 12), tooltip=header), 
              sg.InputText(key=f'-{header}-', size=(17, 1), readonly=True) if not options[header]['options'] and options[header]['combobox_type'] == 'fix' else
-             sg.InputText(key=f'-{header}-', size=(17, 1)) if options[header]['type'] == 'String' and not options[header]['options'] else
+             sg.InputText(key=f'-{header}-', size=(17, 1)) if options[header]['datatype'] == 'str' and not options[header]['options'] else
              sg.Combo(options[header]['options'], key=f'-{header}-', readonly=(options[header]['combobox_type'] == 'fix'), size=(15, 1)) if options[header]['options'] else
              sg.InputText(key=f'-{header}-', size=(17, 1))]
             for header in headers], size=(300, None), scrollable=True, vertical_scroll_only=True),
@@ -111,16 +99,19 @@ while True:
     elif event == '-ADD-':
         entry = [values['-' + header + '-'].replace(".", "-") if values['-' + header + '-'] and header in ["collection_date", "run_date"] else values['-' + header + '-'] for header in headers]
 
-        invalid_date_found = any(header in ["collection_date", "run_date"] and entry[i] and not re.match(r'\d{4}-\d{2}-\d{2}', entry[i]) for i, header in enumerate(headers))
-        
-        if invalid_date_found:
-            sg.popup_error('Invalid date format. Please use YYYY-MM-DD format.', title='Error', font=('Arial', 12))
+        # Checked with the rules used to validate the table
+        failures = data_validation.validate_entry(column_rules, entry)
+
+        if failures:
+            field, message = failures[0]
+            sg.popup_error(f'{field}: {message}', title='Error', font=('Arial', 12))
         elif any(entry):
             selected_row = values['-TABLE-'][0] if values['-TABLE-'] else None
             if selected_row is not None:
-                data[selected_row] = entry
+                JOURNAL.perform('Update', [journal.cell_changes([selected_row] * len(headers), range(len(headers)),
+                                                                data[selected_row], entry)], rows)
             else:
-                data.append(entry)
+                JOURNAL.perform('Add', [journal.RowInsert(len(data), entry)], rows)
             window['-TABLE-'].update(values=data)
             for header in headers:
                 window['-' + header + '-'].update('')
@@ -130,8 +121,7 @@ while True:
     elif event == '-DUPLICATE-':
         selected_row = values['-TABLE-'][0] if values['-TABLE-'] else None
         if selected_row is not None:
-            duplicated_entry = data[selected_row][:]
-            data.append(duplicated_entry)
+            JOURNAL.perform('Duplicate', [journal.RowInsert(len(data), data[selected_row])], rows)
             window['-TABLE-'].update(values=data)
         else:
             sg.popup('Please select a row to duplicate.', title='No Row Selected', font=('Arial', 12), keep_on_top=True)
@@ -139,7 +129,7 @@ while True:
     elif event == '-DELETEENTRY-':
         selected_row = values['-TABLE-'][0] if values['-TABLE-'] else None
         if selected_row is not None:
-            del data[selected_row]
+            JOURNAL.perform('Delete', [journal.RowDelete(selected_row, data[selected_row])], rows)
             window['-TABLE-'].update(values=data)
 
     elif event == '-TEMPLATE-':
@@ -150,62 +140,20 @@ while True:
                 writer.writerow(headers)
     
     elif event == '-CORRECT-':
-        corrected_count = 0
-        correction_applied = True
-        corrected_items = []
-        invalid_date_count = 0
-        invalid_combobox_count = 0
-
-        while correction_applied:
-            correction_applied = False
-
-            for row_index, row in enumerate(data):
-                for col_index, cell in enumerate(row):
-                    if isinstance(cell, str):  # Check if the cell is a string before applying string operations
-                        corrected_cell = cell.strip(',; ')
-                        corrected_cell = re.sub(r'\s+', ' ', corrected_cell)
-                        corrected_cell = re.sub(r',\s*(\S)', r'; \1', corrected_cell)
-                        if headers[col_index] == "locality":
-                            corrected_cell = re.sub(r':(?!\s)', ': ', corrected_cell)
-                        if headers[col_index] == "source_type":
-                            corrected_cell = corrected_cell.capitalize()
-                        if headers[col_index] == "if_repeated":
-                            if corrected_cell.lower() == "yes":
-                                corrected_cell = "y"
-                            elif corrected_cell.lower() == "no":
-                                corrected_cell = "n"
-                        if corrected_cell != cell:
-                            data[row_index][col_index] = corrected_cell
-                            corrected_count += 1
-                            corrected_items.append(f'Row {row_index + 1}, Column {col_index + 1}: {cell} -> {corrected_cell}')
-                            correction_applied = True
-                    elif isinstance(cell, datetime.datetime):  # Handle datetime objects separately
-                        corrected_cell = cell.strftime('%Y-%m-%d %H:%M:%S')  # Convert datetime to string
-                        if corrected_cell != cell:
-                            data[row_index][col_index] = corrected_cell
-                            corrected_count += 1
-                            corrected_items.append(f'Row {row_index + 1}, Column {col_index + 1}: {cell} -> {corrected_cell}')
-                            correction_applied = True
-
-        for row_index, row in enumerate(data):
-            for col_index, cell in enumerate(row):
-                if isinstance(cell, str):  # Check if the cell is a string
-                    if headers[col_index] in ["collection_date", "run_date"]:
-                        if cell:
-                            if not re.match(r'\d{4}-\d{2}-\d{2}', cell):
-                                invalid_date_count += 1
-                    if headers[col_index] in options and 'options' in options[headers[col_index]]:
-                        if cell not in options[headers[col_index]]['options']:
-                            invalid_combobox_count += 1
-
-        data = [row for row in data if any(cell.strip() for cell in row)]
+        # Corrected and validated with the rules of the web version
+        _, changes, invalid_cells = correction.correct_and_validate(headers, options, column_rules, data)
+        # Applied to the rows in place as one step, so the whole correction
+        # pass can be undone and the steps before it still find their rows
+        step = JOURNAL.perform('Correction', changes, rows)
         window['-TABLE-'].update(values=data)
 
-        if corrected_count == 0 and invalid_date_count == 0 and invalid_combobox_count == 0:
+        if step is None and not invalid_cells:
             sg.popup('Data is correct.', title='Correction Result', keep_on_top=True)
         else:
-            corrected_text = '\n'.join(corrected_items)
-            correction_count_text = f'Corrected rows: {corrected_count}\nNumber of cells with invalid date: {invalid_date_count}\nNumber of cells with invalid fixed data options: {invalid_combobox_count}'
+            corrected_items = (f'Row {row_index + 1}, Column {col_index + 1}: {old} -> {new}' for row_index, col_index, old, new in (journal.cells(step) if step else ()))
+            invalid_items = (f"Row {row_index + 1}, Column '{field}': {message}" for row_index, field, message in invalid_cells)
+            corrected_text = '\n'.join(itertools.chain(corrected_items, invalid_items))
+            correction_count_text = f'Corrected cells: {journal.count_cells(step) if step else 0}\nNumber of invalid cells: {len(invalid_cells)}'
             multiline_layout = [
                 [sg.Text(correction_count_text)],
                 [sg.Multiline(corrected_text, size=(50, 10), disabled=True, autoscroll=True)],
@@ -223,27 +171,20 @@ while True:
         filename = sg.popup_get_file('Select file to import', file_types=(("CSV Files", "*.csv"), ("Excel Files", "*.xlsx")), keep_on_top=True)
         if filename:
             if filename.endswith(('.csv', '.xlsx')):
+                old_state = rows.state()
                 data.clear()
                 window['-TABLE-'].update(values=[])
-                temp_data = []
-                if filename.endswith('.csv'):
-                    with open(filename, 'r', newline='', encoding='utf-8') as file:
-                        reader = csv.reader(file)
-                        header_row = next(reader)
-                        for row in reader:
-                            temp_data.append(list(row))
-                else:
-                    workbook = openpyxl.load_workbook(filename)
-                    sheet = workbook.active
-                    header_row = [cell.value for cell in sheet[1]]
-                    for row in sheet.iter_rows(min_row=2, values_only=True):
-                        temp_data.append(list(row))
-
+                # Read and cleaned as the web version imports (all cells as strings)
+                header_row = stream_import.read_header(filename)
+                chunks = [stream_import.clean_imported_file(chunk) for chunk in stream_import.read_chunks(filename)]
+                table = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=header_row, dtype=object)
+                # Closest expected header of each column, computed once per file layout
+                suggestions = SCHEMA.get().resolver.resolve(header_row)
                 missing_headers = [header for header in header_row if header not in headers and header is not None]
                 if missing_headers:
                     suggestion_layout = [
                         [sg.Text(f"The following headers from the imported file are not recognized:\n" + "\n".join(missing_headers))],
-                        *[[sg.Text(f"{header}: "), sg.Combo(headers, key=f'-{header}-suggestion', default_value=difflib.get_close_matches(header, headers)[0] if difflib.get_close_matches(header, headers) else header, size=(30, 1), readonly=True)] for header in missing_headers],
+                        *[[sg.Text(f"{header}: "), sg.Combo(headers, key=f'-{header}-suggestion', default_value=suggestions[header] or header, size=(30, 1), readonly=True)] for header in missing_headers],
                         [sg.Button('No, I will correct manually', key='-NO-'), sg.Button('Yes, replace automatically', key='-YES-')]
                     ]
                     suggestion_popup = sg.Window('Header Suggestions', suggestion_layout, modal=True, keep_on_top=True)
@@ -251,37 +192,37 @@ while True:
                     suggestion_popup.close()
                     if event == '-YES-':
                         header_mapping = {header: values[f'-{header}-suggestion'] for header in missing_headers}
+                        table = header_resolution.remap(table, header_mapping, headers).fillna('')
+                        # Blank cells are imported empty
+                        table = table.mask(table.apply(lambda column: column.astype(str).str.strip() == ''), '')
                         data.clear()
-                        for row in temp_data:
-                            new_row = ['' for _ in headers]
-                            for header in headers:
-                                closest_match = difflib.get_close_matches(header, header_row)
-                                if closest_match:
-                                    selected_header = header_mapping.get(closest_match[0], closest_match[0])
-                                    header_index = header_row.index(closest_match[0])
-                                    cell_value = row[header_index]
-                                    if cell_value.strip():
-                                        new_row[headers.index(selected_header)] = cell_value
-                            data.append(new_row)
+                        data.extend(table.values.tolist())
                 else:
-                    for row in temp_data:
-                        data.append([row[header_row.index(header)] if header in header_row else '' for header in headers])
+                    data.extend(header_resolution.remap(table, {}, headers).values.tolist())
+                JOURNAL.record('Import', [journal.TableReplace(old_state, rows.state())])
 
                 window['-TABLE-'].update(values=data)
 
     elif event == '-SAVE-':
         filename = sg.popup_get_file('Save File', save_as=True, file_types=(("CSV Files", "*.csv"),), keep_on_top=True)
         if filename:
-            with open(filename, 'w', newline='', encoding='utf-8') as file:
-                writer = csv.writer(file)
-                writer.writerow(headers)
-                writer.writerows(data)
+            export.save(pd.DataFrame(data, columns=headers), options, filename)
 
     elif event == '-CLEAR-':
         for header in headers:
             window['-' + header + '-'].update('')
         window['-TABLE-'].update(values=[])
+        # Undoable: the journal keeps the rows data had
+        old_state = rows.state()
         data.clear()
+        JOURNAL.record('Clear', [journal.TableReplace(old_state, rows.state())])
+
+    elif event in ('-UNDO-', '-REDO-'):
+        step = JOURNAL.undo(rows) if event == '-UNDO-' else JOURNAL.redo(rows)
+        if step is None:
+            sg.popup('Nothing to undo.' if event == '-UNDO-' else 'Nothing to redo.', title='MetagenoMongo v1.0', font=('Arial', 12), keep_on_top=True)
+        else:
+            window['-TABLE-'].update(values=data)
 
 # Close the window
 window.close()
@@ -1,47 +1,41 @@
 import os
+import sys
 import csv
-import re
-from datetime import datetime
+import threading
+import itertools
 import pandas as pd
 import PySimpleGUI as sg
 
-def load_headers(filename):
-    if not os.path.exists(filename):
-        sg.popup_error(f"File {filename} not found!")
-        return []
-    with open(filename, 'r') as file:
-        reader = csv.reader(file)
-        headers = [row[0] for row in reader if not row[0].startswith("#")]
-    return headers[1:] # Skip the header row
-
-def load_options(filename):
-    if not os.path.exists(filename):
-        sg.popup_error(f"File {filename} not found!")
-        return {}
-    with open(filename, 'r') as file:
-        reader = csv.reader(file)
-        next(reader)  # Skip the header row
-        options = {}
-        for row in reader:
-            header = row[0] # column name
-            options[header] = {
-                'datatype': row[1], # str, int, float, date
-                'options': row[2].split(',') if row[2] else [], # empty or options within quotation marks
-                'combobox_type': row[3] # fix, dynamic
-            }
-    return options
+# The import pipeline is shared with the web version
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'flask-version', 'metagenomongo'))
+import module.stream_import as stream_import
+import module.schema as schema
+import module.aliases as aliases
+import module.export as export
+import module.correction as correction
+import module.validation as data_validation
+import module.table_model as table_model
+import module.journal as journal
 
 script_dir = os.path.dirname(os.path.abspath(__file__))
 headers_file = os.path.join(script_dir, '.metagenomongo.csv')
 
-headers = load_headers(headers_file)
-options = load_options(headers_file)
+# Parsed once and again only when the file changes
+SCHEMA = schema.SchemaCache(headers_file)
+headers = SCHEMA.get().fields
+options = SCHEMA.get().options
+column_rules = SCHEMA.get().column_rules
+# Header mappings accepted in earlier imports
+ALIASES = aliases.AliasStore(aliases.alias_file(headers_file))
 
 if not headers:
     sg.popup_error("Headers could not be loaded. Please check the .metagenomongo.csv file.")
     exit(1)
 
-data = []
+# The rows of the table, column by column; the sg.Table shows a page of them
+model = table_model.TableModel(headers)
+# The edits of the table, undone and redone from their changes only
+JOURNAL = journal.Journal()
 
 sg.theme('Default1')
 
@@ -58,7 +52,11 @@ layout = [
              sg.Button('Import File', pad=(0, 10), key='-IMPORT-'),
              sg.Button('Save as CSV', pad=(10, 10), key='-SAVE-'),
              sg.Button('Clear', pad=(0, 10), key='-CLEAR-'),
-             sg.Button('Generate template', pad=(10, 10), key='-TEMPLATE-')]
+             sg.Button('Generate template', pad=(10, 10), key='-TEMPLATE-'),
+             sg.Button('Undo', pad=(0, 10), key='-UNDO-'),
+             sg.Button('Redo', pad=(10, 10), key='-REDO-')],
+            [sg.ProgressBar(100, orientation='h', size=(40, 15), key='-PROGRESS-', visible=False),
+             sg.Button('Cancel', key='-CANCEL-OPERATION-', visible=False)]
         ])
     ],
     [
@@ -73,94 +71,164 @@ layout = [
             for header in headers
         ], size=(300, None), scrollable=True, vertical_scroll_only=True),
         sg.Column([
-            [sg.Table(values=data, headings=headers, key='-TABLE-', enable_events=True, 
-                      justification='center', auto_size_columns=True, vertical_scroll_only=False, font=('Helvetica', 12), num_rows=50, pad=(0, 0))]
+            [sg.Table(values=[], headings=headers, key='-TABLE-', enable_events=True, 
+                      justification='center', auto_size_columns=True, vertical_scroll_only=False, font=('Helvetica', 12), num_rows=50, pad=(0, 0))],
+            [sg.Button('<', key='-PAGE-PREV-'), sg.Text('No rows', key='-PAGE-', size=(30, 1)), sg.Button('>', key='-PAGE-NEXT-')]
         ], expand_x=True, expand_y=True)
     ]
 ]
 
-window = sg.Window('MetagenoMongo v1.0', layout, resizable=True, size=(800, 600))
-
-date_pattern = re.compile(r'^\d{4}-\d{2}-\d{2}(T\d{2}:\d{2}:\d{2}\.\d{3}Z)?$') # accepted formats are YYYY-MM-DD or YYYY-MM-DDTHH:MM:SS.fffZ
-
-def is_valid_date(date_str):
-    try:
-        datetime.strptime(date_str, '%Y-%m-%d')
-        return True
-    except ValueError:
+window = sg.Window('MetagenoMongo v1.0', layout, resizable=True, size=(800, 600), finalize=True)
+page = table_model.TablePage(window['-TABLE-'], model)
+
+# Buttons disabled while an import, correction or save runs in the background
+TABLE_BUTTONS = ['-ADD-', '-DUPLICATE-', '-DELETEENTRY-', '-CORRECT-', '-IMPORT-', '-SAVE-', '-CLEAR-', '-UNDO-', '-REDO-']
+# Set by the Cancel button, checked by the running operation after each chunk
+cancel = threading.Event()
+
+class Cancelled(Exception):
+    pass
+
+def report_progress(done, total):
+    # Progress callback of the operations running in the worker thread
+    if cancel.is_set():
+        raise Cancelled()
+    window.write_event_value('-PROGRESS-UPDATE-', (done, total))
+
+def set_busy(busy):
+    for key in TABLE_BUTTONS:
+        window[key].update(disabled=busy)
+    window['-PROGRESS-'].update(current_count=0, visible=busy)
+    window['-CANCEL-OPERATION-'].update(visible=busy)
+
+def run_in_worker(end_key, operation, *args):
+    # Run operation(*args) in a worker thread so the window keeps responding.
+    # The end_key event carries its result: None when it was cancelled, the
+    # exception when it failed.
+    def work():
         try:
-            datetime.strptime(date_str, '%Y-%m-%dT%H:%M:%S.%fZ')
-            return True
-        except ValueError:
-            return False
+            return operation(*args)
+        except Cancelled:
+            return None
+        except Exception as e:
+            return e
+    cancel.clear()
+    set_busy(True)
+    window.perform_long_operation(work, end_key)
+
+def show_page(start):
+    page.show(start)
+    window['-PAGE-'].update(page.label())
+
+def show_step(step):
+    # Show the table after a step was undone or redone: the page of its first
+    # cell with only the rows of its cells updated when it changed cells
+    # only, the page again otherwise
+    if all(isinstance(change, journal.CellChanges) for change in step.changes):
+        rows = sorted({row for change in step.changes for row in change.rows.tolist()})
+        page.show_row(rows[0])
+        for row in rows:
+            page.changed(row)
+        window['-PAGE-'].update(page.label())
+    else:
+        show_page(page.start)
+
+def import_rows(filename, header_mapping):
+    # Read, clean and remap the file chunk by chunk so only one chunk of the
+    # intermediate copies is held at a time
+    total = stream_import.count_rows(filename)
+    chunks = []
+    done = 0
+    for df_temp in stream_import.read_chunks(filename):
+        done += len(df_temp)
+        # Cleaned, the incorrect headers renamed to the selected headers and
+        # reindexed to the expected headers, as the web version imports
+        chunks.append(stream_import.prepare_chunk(df_temp, headers, header_mapping))
+        report_progress(done, total)
+    return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=headers, dtype=object)
+
+def save_rows(table, filename):
+    # Save the columns with data, stripped; typed columns when saved as
+    # parquet, see module/export.py
+    table = table.apply(lambda column: column.str.strip())
+    table = table.loc[:, (table != '').any().to_numpy()]
+    try:
+        export.save(table, options, filename, report_progress)
+    except Cancelled:
+        os.remove(filename)
+        raise
+    return filename
+
+def correct_rows(table):
+    # Corrected and validated with the rules of the web version
+    return correction.correct_and_validate(headers, options, column_rules, table, report_progress)
 
 while True:
     event, values = window.read()
     if event in (sg.WINDOW_CLOSED, 'Exit'):
         break
 
+    elif event == '-PROGRESS-UPDATE-':
+        done, total = values[event]
+        window['-PROGRESS-'].update(current_count=done, max=max(total or done, done, 1))
+
+    elif event == '-CANCEL-OPERATION-':
+        cancel.set()
+
+    elif event == '-PAGE-PREV-':
+        show_page(page.start - page.page_rows)
+
+    elif event == '-PAGE-NEXT-':
+        if page.start + page.page_rows < len(model):
+            show_page(page.start + page.page_rows)
+
     elif event == '-HELP-':
         sg.popup('- - - - - MetagenoMongo help menu - - - - -\n\nThe header files are located in\n.metagenomongo.csv file.', title='MetagenoMongo v1.0', font=('Arial', 12))
 
     elif event == '-ADD-':
-        # Retrieve input values
-        new_entry = []
-        all_empty = True  # Flag to track if all input fields are empty
-        valid = False  # Flag to track if any valid input fields are found
-        for header in headers:
-            value = values[f'-{header}-']
-            if value:  # Non-empty field found
-                all_empty = False
-                valid = True
-                datatype = options[header]['datatype']
-                if datatype == 'int':
-                    if not value.isdigit():
-                        sg.popup_error(f"{header} must be an integer")
-                        valid = False
-                        break
-                elif datatype == 'float':
-                    try:
-                        float(value)
-                    except ValueError:
-                        sg.popup_error(f"{header} must be a float")
-                        valid = False
-                        break
-                elif datatype == 'date':
-                    if not date_pattern.match(value) or not is_valid_date(value):
-                        sg.popup_error(f"{header} must be in a valid YYYY-MM-DD format")
-                        valid = False
-                        break
-            new_entry.append(value)
+        # Retrieve input values, checked with the rules used to validate the table
+        new_entry = [values[f'-{header}-'] for header in headers]
+        all_empty = not any(new_entry)
+        failures = data_validation.validate_entry(column_rules, new_entry)
+        valid = not failures
+        if failures and not all_empty:
+            field, message = failures[0]
+            sg.popup_error(f"{field}: {message}")
 
         if all_empty:
             sg.popup('Please add some data to the table.', title='Missing Data', font=('Arial', 12), keep_on_top=True)
         elif valid:  # Only add/update if at least one valid input field is found
             # Check if updating an existing entry
-            selected_rows = values['-TABLE-']
+            selected_rows = page.selected(values['-TABLE-'])
             if selected_rows:
                 # Update the selected row
-                data[selected_rows[0]] = new_entry
+                row = selected_rows[0]
+                JOURNAL.perform('Update', [journal.cell_changes([row] * len(headers), range(len(headers)),
+                                                                model.row(row), new_entry)], model)
+                page.changed(row)
             else:
                 # Add new entry
-                data.append(new_entry)
-            
+                JOURNAL.perform('Add', [journal.RowInsert(len(model), new_entry)], model)
+                page.appended(len(model) - 1)
+
             # Update the table
-            window['-TABLE-'].update(values=data)
+            window['-PAGE-'].update(page.label())
 
     elif event == '-DUPLICATE-':
-        selected_row = values['-TABLE-'][0] if values['-TABLE-'] else None
+        selected_row = page.selected(values['-TABLE-'])[0] if values['-TABLE-'] else None
         if selected_row is not None:
-            duplicated_entry = data[selected_row][:]
-            data.append(duplicated_entry)
-            window['-TABLE-'].update(values=data)
+            JOURNAL.perform('Duplicate', [journal.RowInsert(len(model), model.row(selected_row))], model)
+            page.appended(len(model) - 1)
+            window['-PAGE-'].update(page.label())
         else:
             sg.popup('Please select a row to duplicate.', title='No Row Selected', font=('Arial', 12), keep_on_top=True)
 
     elif event == '-DELETEENTRY-':
-        selected_row = values['-TABLE-'][0] if values['-TABLE-'] else None
+        selected_row = page.selected(values['-TABLE-'])[0] if values['-TABLE-'] else None
         if selected_row is not None:
-            del data[selected_row]
-            window['-TABLE-'].update(values=data)
+            JOURNAL.perform('Delete', [journal.RowDelete(selected_row, model.row(selected_row))], model)
+            page.deleted(selected_row)
+            window['-PAGE-'].update(page.label())
 
     elif event == '-TEMPLATE-':
         filename = sg.popup_get_file('Save Template As', save_as=True, file_types=(("CSV Files", "*.csv"),), keep_on_top=True)
@@ -172,68 +240,57 @@ while True:
     elif event == '-CLEAR-':
         for header in headers:
             window['-' + header + '-'].update('')
-        window['-TABLE-'].update(values=[])
-        data.clear()
+        # Undoable: the journal keeps the columns the table had
+        old_state = model.state()
+        model.clear()
+        JOURNAL.record('Clear', [journal.TableReplace(old_state, model.state())])
+        show_page(0)
+
+    elif event in ('-UNDO-', '-REDO-'):
+        step = JOURNAL.undo(model) if event == '-UNDO-' else JOURNAL.redo(model)
+        if step is None:
+            sg.popup('Nothing to undo.' if event == '-UNDO-' else 'Nothing to redo.', title='MetagenoMongo v1.0', font=('Arial', 12), keep_on_top=True)
+        else:
+            show_step(step)
 
     elif event == '-SAVE-':
         # Prompt user for file save location
-        save_filename = sg.popup_get_file('Save File', save_as=True, file_types=(("CSV Files", "*.csv"),))
+        save_filename = sg.popup_get_file('Save File', save_as=True, file_types=(("CSV Files", "*.csv"), ("Parquet Files", "*.parquet")))
         if save_filename:
-            # Determine columns with data
-            columns_with_data = [header for header in headers if any(data_row[headers.index(header)] for data_row in data)]
-
-            # Extract and clean data to save
-            data_to_save = [columns_with_data]  # Start with header line
-            for data_row in data:
-                row_to_save = []
-                for header in columns_with_data:  # Only iterate over columns with data
-                    value = data_row[headers.index(header)].strip() if header in headers else ''
-                    row_to_save.append(value)
-                data_to_save.append(row_to_save)
-
-            # Write data to CSV file
-            with open(save_filename, 'w', newline='') as csvfile:
-                csvwriter = csv.writer(csvfile)
-                csvwriter.writerows(data_to_save)
-
-            sg.popup(f"Table data saved to {save_filename}", title='Save Successful', font=('Arial', 12), keep_on_top=True)
+            run_in_worker('-SAVED-', save_rows, model.to_frame(), save_filename)
+
+    elif event == '-SAVED-':
+        set_busy(False)
+        result = values[event]
+        if isinstance(result, Exception):
+            sg.popup_error(str(result), keep_on_top=True)
+        elif result is None:
+            sg.popup('Save cancelled.', title='Save Cancelled', font=('Arial', 12), keep_on_top=True)
+        else:
+            sg.popup(f"Table data saved to {result}", title='Save Successful', font=('Arial', 12), keep_on_top=True)
 
     elif event == '-IMPORT-':
         import_filename = sg.popup_get_file('Import File', file_types=(("CSV Files", "*.csv"), ("Excel Files", "*.xlsx")), keep_on_top=True)
         if import_filename:
-            _, ext = os.path.splitext(import_filename)
-            if ext == '.csv':
-                df_temp = pd.read_csv(import_filename, dtype=str)  # Load as strings
-            elif ext == '.xlsx':
-                df_temp = pd.read_excel(import_filename, dtype=str)  # Load as strings
-            else:
+            try:
+                # Get actual headers from the file
+                imported_headers = stream_import.read_header(import_filename)
+            except ValueError:
+                _, ext = os.path.splitext(import_filename)
                 sg.popup_error(f"Unsupported file format: {ext}. Please select a CSV or Excel file.")
                 continue
 
-            # Strip whitespace from headers
-            df_temp.columns = df_temp.columns.str.strip()
-            
-            # Strip whitespace from data
-            df_temp = df_temp.applymap(lambda x: x.strip() if isinstance(x, str) else x)
-            
-            # Replace NaN with empty strings
-            df_temp = df_temp.fillna('')
-            
-            # Remove fully empty rows
-            df_temp = df_temp[~(df_temp == '').all(axis=1)]
-
             # Ensure headers match with .metagenomongo.csv headers
-            script_dir = os.path.dirname(os.path.abspath(__file__))
-            headers_file = os.path.join(script_dir, '.metagenomongo.csv')
-            expected_headers = load_headers(headers_file)
-            
-            # Get actual headers from the temporary DataFrame
-            imported_headers = list(df_temp.columns)
+            expected_headers = headers
             
             # Identify headers in the input file that do not appear in the expected headers
             incorrect_headers = [header for header in imported_headers if header not in expected_headers]
-            
+
+            # Headers mapped in earlier imports are mapped again without asking
+            header_mapping = ALIASES.lookup(incorrect_headers, expected_headers)
+            incorrect_headers = [header for header in incorrect_headers if header not in header_mapping]
             if incorrect_headers:
+                suggestions = SCHEMA.get().resolver.resolve(incorrect_headers)
                 # Layout for header correction
                 suggestion_layout = [
                     [sg.Text(f"The following headers from the imported file do not match the expected headers:\n" + "\n".join(incorrect_headers))],
@@ -242,7 +299,7 @@ while True:
                 
                 # Create dropdowns for each incorrect header
                 for header in incorrect_headers:
-                    suggestion_layout.append([sg.Text(f"{header}: "), sg.Combo(expected_headers, size=(30, 1), key=f'-{header}-suggestion', readonly=True)])
+                    suggestion_layout.append([sg.Text(f"{header}: "), sg.Combo(expected_headers, default_value=suggestions[header], size=(30, 1), key=f'-{header}-suggestion', readonly=True)])
                 
                 suggestion_layout.append([sg.Button('Cancel', key='-CANCEL-'), sg.Button('Apply Changes', key='-APPLY-')])
                 
@@ -250,106 +307,66 @@ while True:
                 event, values = suggestion_popup.read()
                 suggestion_popup.close()
                 
-                if event == '-APPLY-':
-                    header_mapping = {header: values[f'-{header}-suggestion'] for header in incorrect_headers}
-                    
-                    # Rename the incorrect headers to the selected headers in the DataFrame
-                    df_temp.rename(columns=header_mapping, inplace=True)
-                    
-                    # Remove duplicate columns if they exist
-                    df_temp = df_temp.loc[:, ~df_temp.columns.duplicated()]
-                    
-                    # Reindex df_temp to match the expected headers, filling missing columns with empty strings
-                    df_temp = df_temp.reindex(columns=expected_headers, fill_value='')
-                    
-                    # Remove fully empty rows
-                    df_temp = df_temp[~(df_temp == '').all(axis=1)]
-                    
-                    data = df_temp.values.tolist()
-                    
-                    # Update the table
-                    window['-TABLE-'].update(values=data, num_rows=50)
-                    sg.popup('Data imported successfully with header mapping.', title='Import Successful', font=('Arial', 12), keep_on_top=True)
-                else:
+                if event != '-APPLY-':
                     sg.popup_error('Import cancelled. Please correct the headers manually and try again.', keep_on_top=True)
+                    continue
+                selected_mapping = {header: values[f'-{header}-suggestion'] for header in incorrect_headers}
+                ALIASES.record(selected_mapping)
+                header_mapping.update(selected_mapping)
+
+            # The table is replaced once the whole file is read
+            import_mapped = bool(header_mapping)
+            run_in_worker('-IMPORTED-', import_rows, import_filename, header_mapping)
+
+    elif event == '-IMPORTED-':
+        set_busy(False)
+        result = values[event]
+        if isinstance(result, Exception):
+            sg.popup_error(f"The file could not be imported: {result}", keep_on_top=True)
+        elif result is None:
+            sg.popup('Import cancelled.', title='Import Cancelled', font=('Arial', 12), keep_on_top=True)
+        else:
+            old_state = model.state()
+            model.load_frame(result)
+            JOURNAL.record('Import', [journal.TableReplace(old_state, model.state())])
+
+            # Update the table
+            show_page(0)
+            if import_mapped:
+                sg.popup('Data imported successfully with header mapping.', title='Import Successful', font=('Arial', 12), keep_on_top=True)
             else:
-                # No incorrect headers, just update the table
-                df_temp = df_temp.reindex(columns=expected_headers, fill_value='')  # Ensure columns match the expected headers
-                df_temp = df_temp.loc[:, ~df_temp.columns.duplicated()]  # Remove any duplicate columns
-                
-                # Remove fully empty rows
-                df_temp = df_temp[~(df_temp == '').all(axis=1)]
-                
-                data = df_temp.values.tolist()
-                
-                # Update the table
-                window['-TABLE-'].update(values=data, num_rows=50)
                 sg.popup('Data imported successfully.', title='Import Successful', font=('Arial', 12), keep_on_top=True)
 
     elif event == '-CORRECT-':
-        corrected_count = 0
-        corrected_items = []
-        invalid_date_messages = []
-        invalid_combobox_messages = []
-
-        # Apply corrections to data
-        for row_index, row in enumerate(data):
-            for col_index, cell in enumerate(row):
-                if isinstance(cell, str):  # Process only strings
-                    original_cell = cell
-                    cell = cell.strip(',; ')
-                    cell = re.sub(r'\s+', ' ', cell)
-                    cell = re.sub(r',\s*(\S)', r'; \1', cell)
-                    
-                    # Apply specific column corrections
-                    if headers[col_index] == "locality":
-                        cell = re.sub(r':(?!\s)', ': ', cell)
-                    elif headers[col_index] == "source_type":
-                        cell = cell.capitalize()
-                    elif headers[col_index] == "if_repeated":
-                        cell = "y" if cell.lower() == "yes" else "n" if cell.lower() == "no" else cell
-                    
-                    if cell != original_cell:
-                        data[row_index][col_index] = cell
-                        corrected_count += 1
-                        corrected_items.append(f'Row {row_index + 1}, Column {col_index + 1}: {original_cell} -> {cell}')
-                
-                elif isinstance(cell, datetime.datetime):  # Handle datetime objects separately
-                    original_cell = cell
-                    cell = cell.strftime('%Y-%m-%d %H:%M:%S')
-                    if cell != original_cell:
-                        data[row_index][col_index] = cell
-                        corrected_count += 1
-                        corrected_items.append(f'Row {row_index + 1}, Column {col_index + 1}: {original_cell} -> {cell}')
-        
-        # Validate data
-        for row_index, row in enumerate(data):
-            for col_index, cell in enumerate(row):
-                header = headers[col_index]
-                if isinstance(cell, str):
-                    if header in ["collection_date", "run_date"]:
-                        if not date_pattern.match(cell):
-                            invalid_date_messages.append(f"Invalid date in row {row_index + 1}, column '{header}': '{cell}'")
-                    
-                    if header in options and options[header]['combobox_type'] == 'fix' and options[header]['options']:
-                        if cell not in options[header]['options']:
-                            invalid_combobox_messages.append(f"Invalid fixed option in row {row_index + 1}, column '{header}': '{cell}'")
-
-        # Remove rows that are entirely empty
-        data = [row for row in data if any(cell.strip() for cell in row)]
-        
+        run_in_worker('-CORRECTED-', correct_rows, model.to_frame())
+
+    elif event == '-CORRECTED-':
+        set_busy(False)
+        result = values[event]
+        if isinstance(result, Exception):
+            sg.popup_error(f"The correction failed: {result}", keep_on_top=True)
+            continue
+        if result is None:
+            sg.popup('Correction cancelled, the table is unchanged.', title='Correction Cancelled', font=('Arial', 12), keep_on_top=True)
+            continue
+        _, changes, invalid_cells = result
+        # Applied to the rows in place as one step, so the whole correction
+        # pass can be undone and the steps before it still find their rows
+        step = JOURNAL.perform('Correction', changes, model)
+        corrected_cells = journal.cells(step) if step else ()
+
         # Update the table
-        window['-TABLE-'].update(values=data)
+        show_page(page.start)
 
         # Prepare result text
-        result_text = (f'Corrected rows: {corrected_count}\n'
-                    f'Number of cells with invalid date: {len(invalid_date_messages)}\n'
-                    f'Number of cells with invalid fixed data options: {len(invalid_combobox_messages)}\n'
-                    '---\n')
-        
-        # Add detailed errors
-        detailed_errors = '\n'.join(invalid_date_messages + invalid_combobox_messages)
-        result_text += detailed_errors
+        result_text = (f'Corrected cells: {journal.count_cells(step) if step else 0}\n'
+                       f'Number of invalid cells: {len(invalid_cells)}\n'
+                       '---\n')
+
+        # Add the corrections and detailed errors
+        corrected_items = (f'Row {row_index + 1}, Column {col_index + 1}: {old} -> {new}' for row_index, col_index, old, new in corrected_cells)
+        detailed_errors = (f"Row {row_index + 1}, column '{field}': {message}" for row_index, field, message in invalid_cells)
+        result_text += '\n'.join(itertools.chain(corrected_items, detailed_errors))
 
         layout = [
             [sg.Multiline(size=(80, 60), default_text=result_text, disabled=True, autoscroll=True)],
@@ -366,9 +383,9 @@ while True:
     elif event == '-TABLE-':
         selected_rows = values['-TABLE-']
         if selected_rows:
-            selected_row = selected_rows[0]  # Take the first selected row
-            for i, header in enumerate(headers):
-                window['-' + header + '-'].update(value=data[selected_row][i])
+            selected_row = page.selected(selected_rows)[0]  # Take the first selected row
+            for header, value in zip(headers, model.row(selected_row)):
+                window['-' + header + '-'].update(value=value)
         else:
             for header in headers:
                 window['-' + header + '-'].update('')